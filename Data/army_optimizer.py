@@ -0,0 +1,316 @@
+"""
+army_optimizer.py
+
+Finds the best army lists for an MP / Mat budget.
+
+An army takes units from up to 3 Regiments (RuleBook/Game Rules.md); units
+without a "regiment" column count as one "unassigned" regiment. Each unit can
+be taken up to max_copies times, and a list's score is the sum of its units'
+values for the chosen objective:
+- damage:  expected H one Salvo removes, averaged over a reference enemy list
+           (exact, see salvo_dp)
+- health:  H
+- control: C
+
+The search is a bounded knapsack with two budgets and a regiment limit, run
+once over all allowed regiments: a sparse NumPy dynamic program over partial
+lists (MP, Mat, value, regiments used), adding units in order of value per
+budget. Partial lists are cut as soon as they cannot beat the k-th best list
+found, using fractional (surrogate) bounds on what the remaining units could
+add, and only the k best lists per (MP, Mat, regiments) are kept. A quick
+beam pass first finds k good lists, so the cut is tight from the start. The
+lists are rebuilt by walking the recorded choices back.
+
+Usage: python army_optimizer.py --mp 200 --mat 150 [--objective damage --enemy uuid ...]
+"""
+
+import argparse
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from catalog import Catalog, load_catalog, split_ids, unit_regiment
+from combat_sim import BRITTLE
+from penetration import PenetrationTable
+from salvo_dp import expected_damage, loadout_counts
+
+OBJECTIVES = ("damage", "health", "control")
+MAX_REGIMENTS = 3
+DEFAULT_MAX_COPIES = 3
+# Regiments are tracked as bits of an int64 mask
+MAX_REGIMENT_BITS = 63
+# Mat weights (times MP budget / Mat budget) of the surrogate bounds
+SURROGATE_WEIGHTS = (0.25, 0.5, 1.0, 2.0, 4.0)
+# States kept per step by the first, approximate pass
+BEAM_WIDTH = 2000
+
+
+def _int_stat(unit: Dict[str, str], field: str) -> int:
+    try:
+        return int(unit.get(field) or 0)
+    except ValueError:
+        raise ValueError(f"{unit['name']}: {field} must be a number, got {unit.get(field)!r}") from None
+
+
+def unit_values(catalog: Catalog, objective: str, enemy: Sequence[str] = ()) -> Dict[str, float]:
+    """Objective value of every unit (uuid -> value)."""
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective {objective!r} (expected one of {', '.join(OBJECTIVES)})")
+    if objective == "health":
+        return {u["uuid"]: float(_int_stat(u, "H")) for u in catalog.units}
+    if objective == "control":
+        return {u["uuid"]: float(_int_stat(u, "C")) for u in catalog.units}
+
+    if not enemy:
+        raise ValueError("The damage objective needs a reference enemy list")
+    table = PenetrationTable(catalog.weapons)
+    targets = [catalog.units_by_uuid[uid] for uid in enemy]
+    values = {}
+    for u in catalog.units:
+        weapons = split_ids(u.get("weapons"))
+        total = 0.0
+        for t in targets:
+            counts = loadout_counts(table, weapons, t["A"], brittle=BRITTLE in (t.get("abilities") or ""))
+            total += expected_damage(counts, _int_stat(t, "H"))
+        values[u["uuid"]] = total / len(targets)
+    return values
+
+
+def _popcount(masks: np.ndarray) -> np.ndarray:
+    counts = np.zeros(masks.shape, dtype=np.int64)
+    masks = masks.copy()
+    while masks.any():
+        counts += masks & 1
+        masks >>= 1
+    return counts
+
+
+class _SuffixBound:
+    """
+    Fractional knapsack bound on one budget: for items[i:] (every i), the
+    most value that fits when items may be taken in part.
+    """
+
+    def __init__(self, weights: np.ndarray, values: np.ndarray):
+        self.tables = []
+        for i in range(len(weights) + 1):
+            w, v = weights[i:], values[i:]
+            # Free items first, then best value per point of budget
+            ratio = np.divide(v, w, out=np.full(len(w), np.inf), where=w > 0)
+            order = np.argsort(-ratio, kind="stable")
+            cum_w = np.concatenate(([0], np.cumsum(w[order])))
+            cum_v = np.concatenate(([0.0], np.cumsum(v[order])))
+            self.tables.append((cum_w, cum_v, np.append(ratio[order], 0.0)))
+
+    def __call__(self, i: int, budget: np.ndarray) -> np.ndarray:
+        cum_w, cum_v, ratio = self.tables[i]
+        # Whole items that fit, plus the fitting part of the next one
+        t = np.searchsorted(cum_w, budget, side="right") - 1
+        return cum_v[t] + (budget - cum_w[t]) * ratio[t]
+
+
+class _Search:
+    """
+    Top-k bounded knapsack over two budgets and a regiment limit, as a sparse
+    dynamic program over the lists themselves.
+
+    Items (units, each with up to `copies` copies) are added one at a time,
+    best value per budget first. The states after item i are partial lists
+    (MP, Mat, value, regiment bitmask); each new state is a distinct list and
+    is offered to the running top k. States that cannot beat the k-th best
+    value found so far, even taking the rest of the items fractionally on
+    either budget, are dropped, as are all but the k best states sharing
+    (MP, Mat, regiments) (every completion of those is beaten by the same
+    completion of the k better ones).
+    """
+
+    EPS = 1e-9
+
+    def __init__(self, items: Sequence[Tuple[str, float, int, int, int, int]], cap_mp: int, cap_mat: int,
+                 k: int, max_regiments: int):
+        self.items = list(items)
+        self.cap_mp, self.cap_mat, self.k, self.max_regiments = cap_mp, cap_mat, k, max_regiments
+        copies = np.array([c for *_, c, _ in self.items], dtype=np.int64)
+        values = np.array([v for _, v, *_ in self.items]) * copies
+        item_mp = np.array([m for _, _, m, *_ in self.items], dtype=np.int64) * copies
+        item_mat = np.array([t for _, _, _, t, _, _ in self.items], dtype=np.int64) * copies
+        # Surrogate bounds: both budgets folded into one as MP + weight * Mat, for a
+        # spread of weights around the budgets' ratio (0 is the MP budget alone)
+        scale = cap_mp / max(cap_mat, 1)
+        self.weights = [0.0] + [scale * f for f in SURROGATE_WEIGHTS]
+        self.bounds = [_SuffixBound(item_mp + w * item_mat, values) for w in self.weights]
+        self.bound_mat = _SuffixBound(item_mat, values)
+        self.floor = -np.inf
+        # Per item: parent state in the previous step and copies taken, for every kept state
+        self.parents: List[np.ndarray] = []
+        self.counts: List[np.ndarray] = []
+        # Running top k: value, step and (parent, copies) of the list that step created
+        self.top: List[Tuple[float, int, int, int]] = [(0.0, -1, 0, 0)]
+
+    def _bound(self, step: int, mp: np.ndarray, mat: np.ndarray) -> np.ndarray:
+        """Most value items[step:] could still add to states with this much spent."""
+        rest_mp, rest_mat = self.cap_mp - mp, self.cap_mat - mat
+        bound = self.bound_mat(step, rest_mat)
+        for w, table in zip(self.weights, self.bounds):
+            np.minimum(bound, table(step, rest_mp + w * rest_mat), out=bound)
+        return bound
+
+    def _keep(self, bound: np.ndarray) -> np.ndarray:
+        # States must be able to beat the k-th best list found, and reach the floor
+        keep = bound >= self.floor - self.EPS
+        if len(self.top) == self.k:
+            keep &= bound > self.top[-1][0] + self.EPS
+        return keep
+
+    def _offer(self, step: int, values: np.ndarray, parents: np.ndarray, counts: np.ndarray):
+        if not len(values):
+            return
+        keep = np.argsort(-values, kind="stable")[:self.k]
+        merged = self.top + [(float(values[i]), step, int(parents[i]), int(counts[i])) for i in keep]
+        merged.sort(key=lambda e: -e[0])
+        self.top = merged[:self.k]
+
+    def run(self, beam: Optional[int] = None):
+        """
+        Search every list. With beam, keep only the beam states with the best
+        bounds at each step: fast, but the top k found are only good lists,
+        not necessarily the best (used to set floor for the exact run).
+        """
+        mp = np.zeros(1, dtype=np.int64)
+        mat = np.zeros(1, dtype=np.int64)
+        val = np.zeros(1)
+        mask = np.zeros(1, dtype=np.int64)
+        for step, (_, value, item_mp, item_mat, copies, bit) in enumerate(self.items):
+            allowed = _popcount(mask | bit) <= self.max_regiments
+            parts = [(mp, mat, val, mask, np.arange(len(mp)), np.zeros(len(mp), dtype=np.int64))]
+            for count in range(1, copies + 1):
+                new_mp, new_mat = mp + count * item_mp, mat + count * item_mat
+                idx = np.nonzero(allowed & (new_mp <= self.cap_mp) & (new_mat <= self.cap_mat))[0]
+                if not len(idx):
+                    break
+                parts.append((new_mp[idx], new_mat[idx], val[idx] + count * value, mask[idx] | bit, idx,
+                              np.full(len(idx), count, dtype=np.int64)))
+            for _, _, v, _, parent, count in parts[1:]:
+                self._offer(step, v, parent, count)
+            mp, mat, val, mask, parent, count = (np.concatenate(column) for column in zip(*parts))
+
+            # Drop what cannot reach the top k any more
+            bound = val + self._bound(step + 1, mp, mat)
+            keep = self._keep(bound)
+            if len(mp) > self.k:
+                # At most k states per (MP, Mat, regiments), the best ones
+                order = np.lexsort((-val, mask, mat, mp))
+                key = (mp[order], mat[order], mask[order])
+                new_group = np.ones(len(order), dtype=bool)
+                new_group[1:] = (key[0][1:] != key[0][:-1]) | (key[1][1:] != key[1][:-1]) | (key[2][1:] != key[2][:-1])
+                starts = np.maximum.accumulate(np.where(new_group, np.arange(len(order)), 0))
+                in_group = np.empty(len(order), dtype=bool)
+                in_group[order] = np.arange(len(order)) - starts < self.k
+                keep &= in_group
+            if beam is not None and np.count_nonzero(keep) > beam:
+                cut = np.partition(np.where(keep, -bound, np.inf), beam - 1)[beam - 1]
+                keep &= -bound <= cut
+            mp, mat, val, mask = mp[keep], mat[keep], val[keep], mask[keep]
+            self.parents.append(parent[keep])
+            self.counts.append(count[keep])
+
+    def _units(self, step: int, state: int) -> Tuple[Tuple[str, int], ...]:
+        units = []
+        for s in range(step, -1, -1):
+            count = int(self.counts[s][state])
+            if count:
+                units.append((self.items[s][0], count))
+            state = int(self.parents[s][state])
+        return tuple(reversed(units))
+
+    def lists(self) -> List[Tuple[float, Tuple[Tuple[str, int], ...]]]:
+        """The top k (value, ((uuid, count), ...)), best first."""
+        results = []
+        for value, step, parent, count in self.top:
+            if step < 0:
+                results.append((value, ()))
+                continue
+            units = self._units(step - 1, parent) if step > 0 else ()
+            results.append((value, units + ((self.items[step][0], count),)))
+        return results
+
+
+def optimize(catalog: Catalog, budget_mp: int, budget_mat: int, objective: str = "damage",
+             regiments: Optional[Sequence[str]] = None, enemy: Sequence[str] = (), k: int = 5,
+             max_copies: int = DEFAULT_MAX_COPIES, max_regiments: int = MAX_REGIMENTS) -> List[Dict]:
+    """
+    Top k army lists within budget_mp MP and budget_mat Mat, best first.
+
+    regiments restricts the candidates (default: every regiment in the
+    catalog). Each list is {"value", "MP", "Mat", "regiments", "units": [(uuid, count), ...]}.
+    """
+    values = unit_values(catalog, objective, enemy)
+    by_regiment: Dict[str, List[Dict[str, str]]] = {}
+    for u in catalog.units:
+        by_regiment.setdefault(unit_regiment(u), []).append(u)
+    allowed = list(regiments) if regiments is not None else list(by_regiment)
+    unknown = [r for r in allowed if r not in by_regiment]
+    if unknown:
+        raise ValueError(f"Unknown regiment(s): {', '.join(unknown)}")
+    if len(allowed) > MAX_REGIMENT_BITS:
+        raise ValueError(f"At most {MAX_REGIMENT_BITS} regiments can be searched at once, got {len(allowed)}")
+
+    # Units worth nothing or over budget on their own never help
+    items = []
+    for bit, r in enumerate(allowed):
+        for u in by_regiment[r]:
+            mp, mat = _int_stat(u, "MP"), _int_stat(u, "Mat")
+            if values[u["uuid"]] > 0 and mp <= budget_mp and mat <= budget_mat:
+                items.append((u["uuid"], values[u["uuid"]], mp, mat, max_copies, 1 << bit))
+    # Most value per share of the budgets first, so good lists raise the cut early
+    items.sort(key=lambda e: -e[1] / (e[2] / max(budget_mp, 1) + e[3] / max(budget_mat, 1) or 1e-12))
+
+    # A narrow beam finds k good lists quickly; the exact search then drops
+    # everything that cannot reach the k-th of them from the first step on
+    beam = _Search(items, budget_mp, budget_mat, k, max_regiments)
+    beam.run(BEAM_WIDTH)
+    search = _Search(items, budget_mp, budget_mat, k, max_regiments)
+    if len(beam.top) == k:
+        search.floor = beam.top[-1][0]
+    search.run()
+
+    position = {u["uuid"]: i for i, u in enumerate(catalog.units)}
+    lists = []
+    for value, units in search.lists():
+        if not units:
+            continue
+        rows = [(catalog.units_by_uuid[uid], count) for uid, count in units]
+        lists.append({
+            "value": value,
+            "MP": sum(_int_stat(u, "MP") * c for u, c in rows),
+            "Mat": sum(_int_stat(u, "Mat") * c for u, c in rows),
+            "regiments": sorted({unit_regiment(u) for u, _ in rows}),
+            "units": sorted(units, key=lambda e: position[e[0]]),
+        })
+    return lists
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the best army lists for an MP / Mat budget")
+    parser.add_argument("--mp", type=int, required=True, help="MP budget")
+    parser.add_argument("--mat", type=int, required=True, help="Mat budget")
+    parser.add_argument("--objective", choices=OBJECTIVES, default="health")
+    parser.add_argument("--enemy", nargs="+", default=[],
+                        help="reference enemy unit uuids for the damage objective (repeat a uuid for copies)")
+    parser.add_argument("--regiments", nargs="+", help="regiments to choose from (default: all)")
+    parser.add_argument("-k", "--top", type=int, default=5, help="number of lists to return")
+    parser.add_argument("--max-copies", type=int, default=DEFAULT_MAX_COPIES, help="copies allowed per unit")
+    args = parser.parse_args(argv)
+
+    catalog = load_catalog()
+    lists = optimize(catalog, args.mp, args.mat, args.objective, args.regiments, args.enemy, args.top,
+                     args.max_copies)
+    for rank, army in enumerate(lists, 1):
+        print(f"#{rank}  {args.objective} {army['value']:.3f}  MP {army['MP']}/{args.mp}  "
+              f"Mat {army['Mat']}/{args.mat}  [{', '.join(army['regiments'])}]")
+        for uid, count in army["units"]:
+            print(f"    {count} x {catalog.units_by_uuid[uid]['name']}")
+
+
+if __name__ == "__main__":
+    main()
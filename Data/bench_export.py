@@ -0,0 +1,215 @@
+"""
+bench_export.py
+
+Benchmarks for the data-export path on synthetic catalogs.
+
+Generates units.csv / weapons.csv / tags.csv / keywords.csv at the requested
+sizes (default 10^2, 10^4 and 10^5 units) and times each stage separately:
+- load_csv:  raw CSV parsing of the four files
+- load:      load_catalog (parse + build indexes)
+- open_compiled / load_compiled: mapping catalog.bin, and materialising the
+  full Catalog from it
+- resolve:   resolving every unit's weapons, keyword names and tag names
+- render:    streaming the full units.tex
+- script:    regenerate_units_tex.py end to end, in a subprocess
+
+Peak traced memory is recorded per stage (in a separate pass, so tracing does
+not skew timings). Results are written as JSON; pass --baseline to compare
+against an earlier run and exit non-zero on regressions.
+"""
+
+import argparse
+import csv
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from catalog import KEYWORDS_FILE, TAGS_FILE, UNITS_FILE, WEAPONS_FILE, load_catalog, load_csv
+from compiled_catalog import compile_catalog, load_catalog_compiled, open_compiled
+from tex_export import write_units_tex
+
+DEFAULT_SIZES = [10**2, 10**4, 10**5]
+RESULTS_FILE = "bench_results.json"
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "regenerate_units_tex.py")
+
+ARMOR_CLASSES = ["N", "L", "M", "H"]
+# Loadout sizes seen in the real catalog, weighted towards one or two weapons
+WEAPONS_PER_UNIT = ([1, 2, 3, 4], [55, 30, 10, 5])
+TAGS_PER_UNIT = ([1, 2, 3, 4], [20, 40, 30, 10])
+KEYWORDS_PER_WEAPON = ([0, 1, 2], [40, 45, 15])
+
+
+def _pen_roll(rng: random.Random) -> str:
+    r = rng.random()
+    if r < 0.35:
+        return "NA"
+    if r < 0.5:
+        return f"{rng.randint(2, 11)}-"
+    return f"{rng.randint(1, 13)}+"
+
+
+def generate_catalog(n_units: int, out_dir: str, seed: int = 0):
+    """Write a synthetic four-CSV catalog with n_units units into out_dir."""
+    rng = random.Random(seed)
+    n_weapons = max(10, n_units // 3)
+    n_tags = max(10, min(200, n_units // 50))
+    n_keywords = max(6, min(60, n_units // 200))
+
+    keywords = [{"uuid": f"kw-{i}", "name": f"Keyword {i}"} for i in range(n_keywords)]
+    tags = [{"uuid": f"tag-{i}", "name": f"Tag {i}"} for i in range(n_tags)]
+
+    weapons = []
+    for i in range(n_weapons):
+        k = rng.choices(*KEYWORDS_PER_WEAPON)[0]
+        row = {"uuid": f"weapon-{i}", "name": f"{rng.randint(5, 150)}mm Weapon {i}",
+               "R": str(rng.randint(1, 5))}
+        for a in ARMOR_CLASSES:
+            row[a] = _pen_roll(rng)
+        row["F"] = rng.choice(["NA", "NA", "1", "2"])
+        row["keywords"] = ",".join(kw["uuid"] for kw in rng.sample(keywords, k))
+        weapons.append(row)
+
+    units = []
+    for i in range(n_units):
+        w = rng.choices(*WEAPONS_PER_UNIT)[0]
+        t = rng.choices(*TAGS_PER_UNIT)[0]
+        units.append({
+            "uuid": f"unit-{i}", "name": f"Unit {i}", "subtitle": "Synthetic",
+            "M": str(rng.randint(1, 4)), "A": rng.choice(ARMOR_CLASSES), "C": str(rng.randint(0, 2)),
+            "H": str(rng.randint(1, 6)), "MP": str(rng.choice([15, 20, 25, 50])),
+            "Mat": str(rng.randint(5, 60)),
+            "abilities": "{Brittle} - Attacks against this unit have +1 AP when rolling Up" if rng.random() < 0.1 else "",
+            "weapons": ",".join(x["uuid"] for x in rng.sample(weapons, w)),
+            "tags": ",".join(x["uuid"] for x in rng.sample(tags, t)),
+        })
+
+    for name, rows in ((UNITS_FILE, units), (WEAPONS_FILE, weapons), (TAGS_FILE, tags), (KEYWORDS_FILE, keywords)):
+        with open(os.path.join(out_dir, name), "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def _stages(data_dir: str) -> Dict[str, Callable[[], None]]:
+    catalog = load_catalog(data_dir)
+    compile_catalog(data_dir)
+
+    def stage_load_csv():
+        for name in (UNITS_FILE, WEAPONS_FILE, TAGS_FILE, KEYWORDS_FILE):
+            load_csv(os.path.join(data_dir, name))
+
+    def stage_load():
+        load_catalog(data_dir)
+
+    def stage_open_compiled():
+        open_compiled(data_dir).close()
+
+    def stage_load_compiled():
+        load_catalog_compiled(data_dir)
+
+    def stage_resolve():
+        for unit in catalog.units:
+            for w in catalog.unit_weapons(unit):
+                catalog.weapon_keyword_names(w)
+            catalog.unit_tag_names(unit)
+
+    def stage_render():
+        with open(os.devnull, "w", encoding="utf-8") as f:
+            write_units_tex(catalog, f)
+
+    def stage_script():
+        subprocess.run([sys.executable, SCRIPT_PATH], cwd=data_dir, check=True,
+                       stdout=subprocess.DEVNULL)
+
+    return {"load_csv": stage_load_csv, "load": stage_load, "open_compiled": stage_open_compiled,
+            "load_compiled": stage_load_compiled, "resolve": stage_resolve,
+            "render": stage_render, "script": stage_script}
+
+
+def _best_time(fn: Callable[[], None], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_memory(fn: Callable[[], None]) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks(sizes: List[int], repeat: int = 3, seed: int = 0) -> Dict:
+    results = []
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as data_dir:
+            generate_catalog(n, data_dir, seed)
+            stages = _stages(data_dir)
+            # Larger catalogs are slow enough that one run is representative
+            reps = repeat if n <= 10**4 else 1
+            for stage, fn in stages.items():
+                entry = {"units": n, "stage": stage, "seconds": _best_time(fn, reps)}
+                # The subprocess's memory is not visible to tracemalloc
+                entry["peak_bytes"] = _peak_memory(fn) if stage != "script" else None
+                results.append(entry)
+                print(f"{n:>7} units  {stage:<13} {entry['seconds']:9.4f}s", file=sys.stderr)
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return a message for every stage that got slower than baseline * (1 + tolerance)."""
+    base = {(r["units"], r["stage"]): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        old = base.get((r["units"], r["stage"]))
+        if old and r["seconds"] > old * (1 + tolerance):
+            regressions.append(f"{r['stage']} @ {r['units']} units: {old:.4f}s -> {r['seconds']:.4f}s")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the catalog export path on synthetic catalogs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default=RESULTS_FILE)
+    parser.add_argument("--baseline", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown against the baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.sizes, args.repeat, args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for msg in regressions:
+            print("REGRESSION:", msg)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+build_cards_pdf.py
+
+Builds the unit card PDF without re-running LaTeX over the whole deck.
+
+The catalog is split into one small document per unit (or per regiment with
+--by-regiment), each using the preamble of pdfmaker.tex. Documents are
+compiled in a process pool and every compiled PDF is cached by the hash of
+its source, so after a one-unit stat tweak only that unit's page is rebuilt.
+The cached pages are then merged into the final PDF, and pages the build no
+longer uses (listed in the previous build's manifest) are deleted.
+
+Requires pdflatex on PATH. Merging uses pypdf when installed, otherwise the
+pdfunite or qpdf command line tools.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from catalog import Catalog, load_catalog, unit_regiment
+from tex_export import render_card
+
+TEMPLATE_FILE = "pdfmaker.tex"
+PDF_CACHE_DIR = ".pdf_cache"
+OUTPUT_FILE = "units.pdf"
+MANIFEST_FILE = "manifest.json"
+
+
+def load_preamble(template_path: str = TEMPLATE_FILE) -> str:
+    """Everything in pdfmaker.tex before \\begin{document}."""
+    with open(template_path, encoding="utf-8") as f:
+        template = f.read()
+    idx = template.find("\\begin{document}")
+    if idx < 0:
+        raise ValueError(f"{template_path} has no \\begin{{document}}")
+    return template[:idx]
+
+
+def group_units(catalog: Catalog, by_regiment: bool = False) -> List[Tuple[str, List[Dict[str, str]]]]:
+    """Split units into (name, units) groups, one document per group."""
+    if not by_regiment:
+        return [(u["uuid"], [u]) for u in catalog.units]
+    groups: Dict[str, List[Dict[str, str]]] = {}
+    for u in catalog.units:
+        groups.setdefault(unit_regiment(u), []).append(u)
+    return list(groups.items())
+
+
+def card_document(preamble: str, catalog: Catalog, group: List[Dict[str, str]]) -> str:
+    body = "".join(render_card(catalog, u) for u in group)
+    return preamble + "\\begin{document}\n\n" + body + "\\end{document}\n"
+
+
+def _compile(job):
+    """Compile one card document into the cache. Runs in a worker process."""
+    key, source, data_dir, cache_dir = job
+    with tempfile.TemporaryDirectory() as tmp:
+        tex_path = os.path.join(tmp, "card.tex")
+        with open(tex_path, "w", encoding="utf-8") as f:
+            f.write(source)
+        env = dict(os.environ)
+        # Trailing separator keeps the default TeX search path
+        env["TEXINPUTS"] = os.path.abspath(data_dir) + os.pathsep + env.get("TEXINPUTS", "")
+        proc = subprocess.run(
+            ["pdflatex", "-interaction=nonstopmode", "-halt-on-error", "card.tex"],
+            cwd=tmp, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        )
+        pdf_path = os.path.join(tmp, "card.pdf")
+        if proc.returncode != 0 or not os.path.exists(pdf_path):
+            log = proc.stdout.decode("utf-8", errors="replace")
+            return key, False, log[-2000:]
+        tmp_target = os.path.join(cache_dir, key + ".pdf.tmp")
+        shutil.copyfile(pdf_path, tmp_target)
+        os.replace(tmp_target, os.path.join(cache_dir, key + ".pdf"))
+    return key, True, ""
+
+
+def merge_pdfs(paths: List[str], out_path: str):
+    try:
+        from pypdf import PdfWriter
+    except ImportError:
+        PdfWriter = None
+
+    if PdfWriter is not None:
+        writer = PdfWriter()
+        for p in paths:
+            writer.append(p)
+        with open(out_path, "wb") as f:
+            writer.write(f)
+    elif len(paths) == 1:
+        shutil.copyfile(paths[0], out_path)
+    elif shutil.which("pdfunite"):
+        subprocess.run(["pdfunite", *paths, out_path], check=True)
+    elif shutil.which("qpdf"):
+        subprocess.run(["qpdf", "--empty", "--pages", *paths, "--", out_path], check=True)
+    else:
+        raise RuntimeError("No PDF merger available: install pypdf, pdfunite (poppler) or qpdf")
+
+
+def _read_manifest(cache_dir: str) -> List[str]:
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return []
+    return manifest if isinstance(manifest, list) else []
+
+
+def _prune(cache_dir: str, keys: List[str]):
+    """Delete the pages of the previous build that this one did not use, and record this build's."""
+    current = set(keys)
+    for key in set(_read_manifest(cache_dir)) - current:
+        try:
+            os.remove(os.path.join(cache_dir, key + ".pdf"))
+        except FileNotFoundError:
+            pass
+    manifest_path = os.path.join(cache_dir, MANIFEST_FILE)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(sorted(current), f)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def build_pdf(catalog: Catalog, out_path: str = OUTPUT_FILE, data_dir: str = ".",
+              cache_dir: str = PDF_CACHE_DIR, by_regiment: bool = False,
+              jobs: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Build the card PDF, compiling only documents missing from the cache.
+
+    Returns (compiled, reused) document counts.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    preamble = load_preamble(os.path.join(data_dir, TEMPLATE_FILE))
+
+    keys = []
+    pending = []
+    for _, group in group_units(catalog, by_regiment):
+        source = card_document(preamble, catalog, group)
+        key = hashlib.sha1(source.encode("utf-8")).hexdigest()
+        keys.append(key)
+        if not os.path.exists(os.path.join(cache_dir, key + ".pdf")):
+            pending.append((key, source, data_dir, cache_dir))
+
+    # Identical documents (e.g. duplicated units) only need compiling once
+    pending = list({job[0]: job for job in pending}.values())
+    if pending:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            failures = [(key, log) for key, ok, log in pool.map(_compile, pending) if not ok]
+        if failures:
+            key, log = failures[0]
+            raise RuntimeError(f"{len(failures)} card document(s) failed to compile; first ({key}):\n{log}")
+
+    if keys:
+        merge_pdfs([os.path.join(cache_dir, k + ".pdf") for k in keys], out_path)
+    _prune(cache_dir, keys)
+    return len(pending), len(keys) - len(pending)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the unit card PDF with per-card caching")
+    parser.add_argument("-o", "--output", default=OUTPUT_FILE)
+    parser.add_argument("--by-regiment", action="store_true",
+                        help="one document per regiment instead of one per unit")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="parallel LaTeX processes")
+    parser.add_argument("--cache-dir", default=PDF_CACHE_DIR)
+    args = parser.parse_args(argv)
+
+    catalog = load_catalog()
+    compiled, reused = build_pdf(catalog, args.output, cache_dir=args.cache_dir,
+                                 by_regiment=args.by_regiment, jobs=args.jobs)
+    print(f"Wrote {args.output} ({compiled} compiled, {reused} cached)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+catalog.py
+
+Indexed in-memory view of the unit catalog (units, weapons, tags, keywords).
+
+The four CSVs are loaded once into uuid-keyed dictionaries, together with
+reverse indexes (weapon -> units, tag -> units, keyword -> weapons), so the
+editor and the TeX exporters can resolve relations without scanning lists.
+"""
+
+import csv
+import os
+from typing import Dict, List, Optional
+
+from edit_journal import JOURNAL_FILE, replay_journal
+
+UNITS_FILE = "units.csv"
+WEAPONS_FILE = "weapons.csv"
+TAGS_FILE = "tags.csv"
+KEYWORDS_FILE = "keywords.csv"
+
+UNITS_FIELDS = ["uuid", "name", "subtitle", "M", "A", "C", "H", "MP", "Mat", "abilities", "weapons", "tags"]
+WEAPONS_FIELDS = ["uuid", "name", "R", "N", "L", "M", "H", "F", "keywords"]
+# Units may carry an optional "regiment" column
+UNASSIGNED_REGIMENT = "unassigned"
+
+
+def load_csv(path):
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+    except FileNotFoundError:
+        return []
+
+
+def split_ids(field: Optional[str]) -> List[str]:
+    """Split a comma-joined uuid field (e.g. a unit's "weapons") into uuids."""
+    if not field:
+        return []
+    return [s for s in field.split(",") if s]
+
+
+def unit_regiment(unit: Dict[str, str]) -> str:
+    return unit.get("regiment") or UNASSIGNED_REGIMENT
+
+
+class Catalog:
+    """Units, weapons, tags and keywords with O(1) lookups by uuid.
+
+    The row lists are kept as-is. Edits should go through upsert_unit() /
+    upsert_weapon(), which keep the indexes current in O(row size); after
+    changing the lists directly, call reindex().
+    """
+
+    def __init__(self, units: List[Dict[str, str]], weapons: List[Dict[str, str]],
+                 tags: List[Dict[str, str]], keywords: List[Dict[str, str]]):
+        self.units = units
+        self.weapons = weapons
+        self.tags = tags
+        self.keywords = keywords
+        self.reindex()
+
+    def reindex(self):
+        self.units_by_uuid = {u["uuid"]: u for u in self.units}
+        self.weapons_by_uuid = {w["uuid"]: w for w in self.weapons}
+        self.tags_by_uuid = {t["uuid"]: t for t in self.tags}
+        self.keywords_by_uuid = {k["uuid"]: k for k in self.keywords}
+
+        # Name lookups for the editor; the first row with a name wins
+        self.units_by_name: Dict[str, Dict[str, str]] = {}
+        for u in self.units:
+            self.units_by_name.setdefault(u["name"], u)
+        self.weapons_by_name: Dict[str, Dict[str, str]] = {}
+        for w in self.weapons:
+            self.weapons_by_name.setdefault(w["name"], w)
+
+        # Catalog positions, so resolved relations keep the CSV order
+        self._weapon_pos = {w["uuid"]: i for i, w in enumerate(self.weapons)}
+        self._tag_pos = {t["uuid"]: i for i, t in enumerate(self.tags)}
+        self._keyword_pos = {k["uuid"]: i for i, k in enumerate(self.keywords)}
+
+        # Reverse indexes
+        self.units_by_weapon: Dict[str, List[str]] = {}
+        self.units_by_tag: Dict[str, List[str]] = {}
+        self.weapons_by_keyword: Dict[str, List[str]] = {}
+        for u in self.units:
+            for wid in split_ids(u.get("weapons")):
+                self.units_by_weapon.setdefault(wid, []).append(u["uuid"])
+            for tid in split_ids(u.get("tags")):
+                self.units_by_tag.setdefault(tid, []).append(u["uuid"])
+        for w in self.weapons:
+            for kid in split_ids(w.get("keywords")):
+                self.weapons_by_keyword.setdefault(kid, []).append(w["uuid"])
+
+    @staticmethod
+    def _unlink(index, ids, uid):
+        for i in ids:
+            owners = index.get(i)
+            if owners and uid in owners:
+                owners.remove(uid)
+
+    @staticmethod
+    def _link(index, ids, uid):
+        for i in ids:
+            index.setdefault(i, []).append(uid)
+
+    @staticmethod
+    def _rename(by_name, row, new_name):
+        if new_name is None or new_name == row.get("name"):
+            return
+        if by_name.get(row.get("name")) is row:
+            del by_name[row["name"]]
+        by_name.setdefault(new_name, row)
+
+    def upsert_unit(self, row: Dict[str, str]) -> Dict[str, str]:
+        """Insert a unit or update the one with the same uuid; returns the stored row."""
+        unit = self.units_by_uuid.get(row["uuid"])
+        if unit is None:
+            unit = dict(row)
+            self.units.append(unit)
+            self.units_by_uuid[unit["uuid"]] = unit
+            self.units_by_name.setdefault(unit.get("name"), unit)
+        else:
+            self._unlink(self.units_by_weapon, split_ids(unit.get("weapons")), unit["uuid"])
+            self._unlink(self.units_by_tag, split_ids(unit.get("tags")), unit["uuid"])
+            self._rename(self.units_by_name, unit, row.get("name"))
+            unit.update(row)
+        self._link(self.units_by_weapon, split_ids(unit.get("weapons")), unit["uuid"])
+        self._link(self.units_by_tag, split_ids(unit.get("tags")), unit["uuid"])
+        return unit
+
+    def upsert_weapon(self, row: Dict[str, str]) -> Dict[str, str]:
+        """Insert a weapon or update the one with the same uuid; returns the stored row."""
+        weapon = self.weapons_by_uuid.get(row["uuid"])
+        if weapon is None:
+            weapon = dict(row)
+            self._weapon_pos[weapon["uuid"]] = len(self.weapons)
+            self.weapons.append(weapon)
+            self.weapons_by_uuid[weapon["uuid"]] = weapon
+            self.weapons_by_name.setdefault(weapon.get("name"), weapon)
+        else:
+            self._unlink(self.weapons_by_keyword, split_ids(weapon.get("keywords")), weapon["uuid"])
+            self._rename(self.weapons_by_name, weapon, row.get("name"))
+            weapon.update(row)
+        self._link(self.weapons_by_keyword, split_ids(weapon.get("keywords")), weapon["uuid"])
+        return weapon
+
+    @staticmethod
+    def _resolve(field, by_uuid, positions):
+        ids = {i for i in split_ids(field) if i in by_uuid}
+        return [by_uuid[i] for i in sorted(ids, key=positions.__getitem__)]
+
+    # Relation lookups (results follow catalog order, unknown uuids are skipped)
+
+    def unit_weapons(self, unit: Dict[str, str]) -> List[Dict[str, str]]:
+        return self._resolve(unit.get("weapons"), self.weapons_by_uuid, self._weapon_pos)
+
+    def unit_tags(self, unit: Dict[str, str]) -> List[Dict[str, str]]:
+        return self._resolve(unit.get("tags"), self.tags_by_uuid, self._tag_pos)
+
+    def weapon_keywords(self, weapon: Dict[str, str]) -> List[Dict[str, str]]:
+        return self._resolve(weapon.get("keywords"), self.keywords_by_uuid, self._keyword_pos)
+
+    def unit_tag_names(self, unit: Dict[str, str]) -> List[str]:
+        return [t["name"] for t in self.unit_tags(unit)]
+
+    def weapon_keyword_names(self, weapon: Dict[str, str]) -> List[str]:
+        return [k["name"] for k in self.weapon_keywords(weapon)]
+
+
+def load_catalog(data_dir: str = ".") -> Catalog:
+    """Load the four catalog CSVs from data_dir, plus any editor saves still in the journal."""
+    units = load_csv(os.path.join(data_dir, UNITS_FILE))
+    weapons = load_csv(os.path.join(data_dir, WEAPONS_FILE))
+    replay_journal({"units": units, "weapons": weapons}, os.path.join(data_dir, JOURNAL_FILE))
+    return Catalog(
+        units,
+        weapons,
+        load_csv(os.path.join(data_dir, TAGS_FILE)),
+        load_csv(os.path.join(data_dir, KEYWORDS_FILE)),
+    )
@@ -0,0 +1,289 @@
+"""
+catalog_db.py
+
+Optional SQLite store for the unit catalog (the editor uses it when run with
+CATALOG_BACKEND=sqlite). The CSVs stay the interchange format: import_csv()
+and export_csv() round-trip their contents (column order, row order,
+relation order, empty relation entries and any extra columns are kept;
+quoting and line endings are the csv module's, and cells missing from short
+rows are written empty).
+
+Tables:
+- units, weapons, tags, keywords (uuid primary key, indexed name, position)
+- unit_weapons, unit_tags, weapon_keywords (ordered join tables, indexed both ways)
+- meta (CSV headers and the fingerprints of the CSVs last synced)
+
+Lookups by name, renames and relation edits are single indexed statements.
+
+Usage: python catalog_db.py import|export [--db catalog.sqlite3] [--data-dir .]
+Nothing is written to the CSVs unless export is asked for.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+from typing import Dict, List, Optional
+
+from catalog import (KEYWORDS_FILE, TAGS_FILE, UNITS_FIELDS, UNITS_FILE, WEAPONS_FIELDS, WEAPONS_FILE,
+                     Catalog, load_catalog)
+from edit_journal import write_csv_atomic
+
+DB_PATH = "catalog.sqlite3"
+
+# table -> (csv file, default header, stat columns stored as real columns)
+TABLES = {
+    "units": (UNITS_FILE, UNITS_FIELDS, ["name", "subtitle", "M", "A", "C", "H", "MP", "Mat", "abilities"]),
+    "weapons": (WEAPONS_FILE, WEAPONS_FIELDS, ["name", "R", "N", "L", "M", "H", "F"]),
+    "tags": (TAGS_FILE, ["uuid", "name"], ["name"]),
+    "keywords": (KEYWORDS_FILE, ["uuid", "name"], ["name"]),
+}
+# (join table, owner table, CSV field, owner column, target column)
+RELATIONS = [
+    ("unit_weapons", "units", "weapons", "unit_uuid", "weapon_uuid"),
+    ("unit_tags", "units", "tags", "unit_uuid", "tag_uuid"),
+    ("weapon_keywords", "weapons", "keywords", "weapon_uuid", "keyword_uuid"),
+]
+
+
+def connect(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON;")
+    return conn
+
+
+def init_db(conn: sqlite3.Connection):
+    c = conn.cursor()
+    for table, (_, _, columns) in TABLES.items():
+        cols = ", ".join(f'"{col}" TEXT' for col in columns)
+        c.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            uuid TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            {cols},
+            extra TEXT  -- JSON object of CSV columns without a dedicated column
+        );
+        """)
+        c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_name ON {table}(name);")
+        c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_position ON {table}(position);")
+
+    # Join tables keep the order of the comma-joined CSV field. Targets are not
+    # foreign keys, so references to missing rows survive a round trip.
+    for join, owner, _, owner_col, target_col in RELATIONS:
+        c.execute(f"""
+        CREATE TABLE IF NOT EXISTS {join} (
+            {owner_col} TEXT NOT NULL REFERENCES {owner}(uuid) ON DELETE CASCADE ON UPDATE CASCADE,
+            position INTEGER NOT NULL,
+            {target_col} TEXT NOT NULL,
+            PRIMARY KEY({owner_col}, position)
+        );
+        """)
+        c.execute(f"CREATE INDEX IF NOT EXISTS idx_{join}_target ON {join}({target_col}, {owner_col});")
+
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """)
+    conn.commit()
+
+
+def _get_meta(conn: sqlite3.Connection, key: str):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def _set_meta(conn: sqlite3.Connection, key: str, value):
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+
+def _csv_fingerprints(data_dir: str) -> Dict[str, Optional[List[int]]]:
+    result = {}
+    for table, (fname, _, _) in TABLES.items():
+        try:
+            st = os.stat(os.path.join(data_dir, fname))
+            result[table] = [st.st_mtime_ns, st.st_size]
+        except FileNotFoundError:
+            result[table] = None
+    return result
+
+
+def _raw_ids(field: Optional[str]) -> List[str]:
+    # Unlike split_ids, keeps empty entries (e.g. "a,,b") so export writes the field back as it was
+    return field.split(",") if field else []
+
+
+def _relation_for(table: str, field: str):
+    return next((r for r in RELATIONS if r[1] == table and r[2] == field), None)
+
+
+def _insert_row(conn: sqlite3.Connection, table: str, row: Dict[str, str], position: int):
+    columns = TABLES[table][2]
+    relation_fields = {r[2] for r in RELATIONS if r[1] == table}
+    extra = {k: v for k, v in row.items() if k != "uuid" and k not in columns and k not in relation_fields}
+    placeholders = ", ".join("?" for _ in range(len(columns) + 3))
+    col_sql = ", ".join(f'"{col}"' for col in columns)
+    conn.execute(
+        f"INSERT INTO {table} (uuid, position, {col_sql}, extra) VALUES ({placeholders})",
+        [row["uuid"], position] + [row.get(col) for col in columns] + [json.dumps(extra) if extra else None],
+    )
+    for field in relation_fields:
+        _set_relation(conn, table, row["uuid"], field, _raw_ids(row.get(field)))
+
+
+def _set_relation(conn: sqlite3.Connection, table: str, owner_uuid: str, field: str, ids: List[str]):
+    join, _, _, owner_col, target_col = _relation_for(table, field)
+    conn.execute(f"DELETE FROM {join} WHERE {owner_col} = ?", (owner_uuid,))
+    conn.executemany(
+        f"INSERT INTO {join} ({owner_col}, position, {target_col}) VALUES (?, ?, ?)",
+        [(owner_uuid, i, target) for i, target in enumerate(ids)],
+    )
+
+
+# CSV import / export
+
+def import_csv(conn: sqlite3.Connection, data_dir: str = "."):
+    """Replace the store's contents with the CSVs in data_dir (including journaled saves)."""
+    catalog = load_catalog(data_dir)
+    rows_by_table = {"units": catalog.units, "weapons": catalog.weapons,
+                     "tags": catalog.tags, "keywords": catalog.keywords}
+    with conn:
+        for join, *_ in RELATIONS:
+            conn.execute(f"DELETE FROM {join}")
+        for table, rows in rows_by_table.items():
+            conn.execute(f"DELETE FROM {table}")
+            for position, row in enumerate(rows):
+                _insert_row(conn, table, row, position)
+            # Remember the exact header so export reproduces it
+            header = list(rows[0].keys()) if rows else TABLES[table][1]
+            _set_meta(conn, f"{table}.fields", header)
+        _set_meta(conn, "sources", _csv_fingerprints(data_dir))
+
+
+def export_csv(conn: sqlite3.Connection, data_dir: str = "."):
+    """Write the four CSVs from the store (each through temp file + rename)."""
+    catalog = load_catalog_db(conn)
+    rows_by_table = {"units": catalog.units, "weapons": catalog.weapons,
+                     "tags": catalog.tags, "keywords": catalog.keywords}
+    for table, rows in rows_by_table.items():
+        fname, default_fields, _ = TABLES[table]
+        fields = _get_meta(conn, f"{table}.fields") or default_fields
+        write_csv_atomic(os.path.join(data_dir, fname), rows, fields)
+    mark_synced(conn, data_dir)
+
+
+def mark_synced(conn: sqlite3.Connection, data_dir: str = "."):
+    """Record the CSVs as matching the store (after writing them from the same rows)."""
+    with conn:
+        _set_meta(conn, "sources", _csv_fingerprints(data_dir))
+
+
+def csv_changed_since_sync(conn: sqlite3.Connection, data_dir: str = ".") -> bool:
+    """True if the CSVs were modified outside the store since the last import/export."""
+    return _get_meta(conn, "sources") != _csv_fingerprints(data_dir)
+
+
+def _rows(conn: sqlite3.Connection, table: str) -> List[Dict[str, str]]:
+    columns = TABLES[table][2]
+    fields = _get_meta(conn, f"{table}.fields") or TABLES[table][1]
+    col_sql = ", ".join(f'"{col}"' for col in columns)
+    relations = [r for r in RELATIONS if r[1] == table]
+
+    # One ordered scan per join table instead of a query per row
+    related: Dict[str, Dict[str, List[str]]] = {}
+    for join, _, field, owner_col, target_col in relations:
+        by_owner = related[field] = {}
+        for owner, target in conn.execute(
+                f"SELECT {owner_col}, {target_col} FROM {join} ORDER BY {owner_col}, position"):
+            by_owner.setdefault(owner, []).append(target)
+
+    rows = []
+    for r in conn.execute(f"SELECT uuid, {col_sql}, extra FROM {table} ORDER BY position"):
+        values = {"uuid": r[0]}
+        values.update(zip(columns, r[1:-1]))
+        if r[-1]:
+            values.update(json.loads(r[-1]))
+        for _, _, field, _, _ in relations:
+            values[field] = ",".join(related[field].get(r[0], []))
+        ordered = {f: values[f] for f in fields if f in values and values[f] is not None}
+        ordered.update({k: v for k, v in values.items() if k not in ordered and v is not None})
+        rows.append(ordered)
+    return rows
+
+
+def load_catalog_db(conn: sqlite3.Connection) -> Catalog:
+    return Catalog(_rows(conn, "units"), _rows(conn, "weapons"), _rows(conn, "tags"), _rows(conn, "keywords"))
+
+
+# Indexed lookups and edits
+
+def find_by_name(conn: sqlite3.Connection, table: str, name: str) -> Optional[str]:
+    """uuid of the first row (in catalog order) with this name."""
+    r = conn.execute(f"SELECT uuid FROM {table} WHERE name = ? ORDER BY position LIMIT 1", (name,)).fetchone()
+    return r[0] if r else None
+
+
+def upsert(conn: sqlite3.Connection, table: str, row: Dict[str, str]):
+    """Insert or update one row and replace its relation lists."""
+    with conn:
+        r = conn.execute(f"SELECT position, extra FROM {table} WHERE uuid = ?", (row["uuid"],)).fetchone()
+        if r is None:
+            position = conn.execute(f"SELECT COALESCE(MAX(position) + 1, 0) FROM {table}").fetchone()[0]
+            _insert_row(conn, table, row, position)
+            return
+        columns = TABLES[table][2]
+        relation_fields = {rel[2] for rel in RELATIONS if rel[1] == table}
+        extra = json.loads(r[1]) if r[1] else {}
+        extra.update({k: v for k, v in row.items()
+                      if k != "uuid" and k not in columns and k not in relation_fields})
+        updates = [col for col in columns if col in row]
+        set_sql = ", ".join([f'"{col}" = ?' for col in updates] + ["extra = ?"])
+        conn.execute(f"UPDATE {table} SET {set_sql} WHERE uuid = ?",
+                     [row[col] for col in updates] + [json.dumps(extra) if extra else None, row["uuid"]])
+        for field in relation_fields:
+            if field in row:
+                _set_relation(conn, table, row["uuid"], field, _raw_ids(row[field]))
+
+
+def rename(conn: sqlite3.Connection, table: str, uuid: str, new_name: str):
+    with conn:
+        conn.execute(f"UPDATE {table} SET name = ? WHERE uuid = ?", (new_name, uuid))
+
+
+def set_relation(conn: sqlite3.Connection, table: str, owner_uuid: str, field: str, ids: List[str]):
+    """Replace e.g. a unit's weapons: set_relation(conn, "units", uid, "weapons", [...])."""
+    with conn:
+        _set_relation(conn, table, owner_uuid, field, ids)
+
+
+def owners_of(conn: sqlite3.Connection, table: str, field: str, target_uuid: str) -> List[str]:
+    """Reverse lookup, e.g. the units using a weapon: owners_of(conn, "units", "weapons", wid)."""
+    join, _, _, owner_col, target_col = _relation_for(table, field)
+    return [r[0] for r in conn.execute(
+        f"SELECT DISTINCT {owner_col} FROM {join} WHERE {target_col} = ?", (target_uuid,))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move the catalog between the CSVs and catalog.sqlite3")
+    parser.add_argument("command", choices=["import", "export"],
+                        help="import: replace the store with the CSVs; export: overwrite the CSVs from the store")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--data-dir", default=".", help="folder holding the catalog CSVs")
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db)
+    try:
+        init_db(conn)
+        if args.command == "import":
+            import_csv(conn, args.data_dir)
+            print(f"Imported the CSVs in {args.data_dir} into {args.db}")
+        else:
+            export_csv(conn, args.data_dir)
+            print(f"Exported {args.db} to the CSVs in {args.data_dir}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
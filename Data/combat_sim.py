@@ -0,0 +1,175 @@
+"""
+combat_sim.py
+
+Monte Carlo duels between two units of the catalog.
+
+Each turn both units fire at each other (the first unit shoots first, unless
+simultaneous=True), and every penetrating roll removes 1 H. Two fire modes
+follow the rulebook's actions:
+- "salvo": every weapon of the unit fires once
+- "shot":  only the unit's best weapon against the target fires, with the
+           roll capped at 4- / 9+
+
+Trials run in NumPy batches: one array of rolls per turn for all trials still
+in progress, so a million duels take well under a second. workers > 1 splits
+the trials over a process pool, each worker seeded from its own
+SeedSequence.spawn() child, so results are reproducible for a given seed.
+
+Usage: python combat_sim.py <unit uuid> <unit uuid> [--trials N] [--mode shot]
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from catalog import Catalog, load_catalog, split_ids
+from penetration import ARMOR_INDEX, DIE, UP, PenetrationTable, success_counts
+
+MODES = ("salvo", "shot")
+DEFAULT_TRIALS = 1_000_000
+DEFAULT_TURNS = 20
+# Trials simulated together; bounds memory to a few MB per array
+BATCH = 1 << 18
+# Attacks against a Brittle unit get +1 when rolling up
+BRITTLE = "{Brittle}"
+
+
+def _int_stat(unit: Dict[str, str], field: str) -> int:
+    try:
+        return int(unit.get(field) or 0)
+    except ValueError:
+        raise ValueError(f"{unit['name']}: {field} must be a number, got {unit.get(field)!r}") from None
+
+
+def volley_counts(table: PenetrationTable, weapon_uuids: List[str], target: Dict[str, str],
+                  mode: str = "salvo") -> np.ndarray:
+    """Penetrating d12 faces of each weapon that fires in one turn against target."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown fire mode {mode!r} (expected one of {', '.join(MODES)})")
+    armor = ARMOR_INDEX.get(target.get("A"))
+    if armor is None:
+        raise ValueError(f"{target['name']}: unknown armor class {target.get('A')!r}")
+    rows = table.rows([u for u in weapon_uuids if u in table.index])
+    threshold = table.threshold[rows, armor]
+    direction = table.direction[rows, armor]
+    modifier = np.where(direction == UP, 1, 0) if BRITTLE in (target.get("abilities") or "") else 0
+    counts = success_counts(threshold, direction, modifier, shot=(mode == "shot"))
+    if mode == "shot":
+        # One weapon: the one most likely to get through
+        counts = counts[[np.argmax(counts)]] if len(counts) else counts
+    return counts
+
+
+def _simulate(counts: Tuple[np.ndarray, np.ndarray], health: Tuple[int, int], trials: int, max_turns: int,
+              simultaneous: bool, seed) -> Dict[str, np.ndarray]:
+    """
+    Run trials duels; side s fires counts[s] at the other side. Returns summed
+    statistics (see simulate_duel), so results of several calls can be added.
+    """
+    rng = np.random.default_rng(seed)
+    probs = [c.astype(np.float64) / DIE for c in counts]
+    ttk = np.zeros((2, max_turns + 1), dtype=np.int64)
+    h_lost = np.zeros((2, max_turns), dtype=np.int64)
+
+    for start in range(0, trials, BATCH):
+        n = min(BATCH, trials - start)
+        hp = np.empty((2, n), dtype=np.int32)
+        hp[0], hp[1] = health
+        active = np.arange(n)
+
+        for turn in range(max_turns):
+            if not len(active):
+                break
+            alive_at_start = hp[:, active] > 0
+            for shooter in (0, 1):
+                target = 1 - shooter
+                if not len(probs[shooter]):
+                    continue
+                # A unit killed earlier this turn only shoots back in simultaneous mode
+                can_fire = alive_at_start[shooter] if simultaneous else hp[shooter, active] > 0
+                hits = (rng.random((len(active), len(probs[shooter]))) < probs[shooter]).sum(axis=1)
+                hits *= can_fire
+                before = hp[target, active]
+                after = np.maximum(before - hits, 0)
+                hp[target, active] = after
+                h_lost[target, turn] += int((before - after).sum())
+                ttk[shooter, turn] += int(np.count_nonzero((before > 0) & (after == 0)))
+            active = active[(hp[0, active] > 0) & (hp[1, active] > 0)]
+
+    # Last column: the opponent was still standing after max_turns
+    for shooter in (0, 1):
+        ttk[shooter, max_turns] = trials - ttk[shooter, :max_turns].sum()
+    return {"ttk": ttk, "h_lost": h_lost}
+
+
+def simulate_duel(catalog: Catalog, first_uuid: str, second_uuid: str, trials: int = DEFAULT_TRIALS,
+                  max_turns: int = DEFAULT_TURNS, mode: str = "salvo", simultaneous: bool = False,
+                  seed: Optional[int] = None, workers: int = 1, table: Optional[PenetrationTable] = None) -> Dict:
+    """
+    Duel two units trials times. The result holds, per side (in argument order):
+    - ttk: trials in which this side killed its opponent in turn t (index t-1);
+      the last entry counts trials where it did not within max_turns
+    - kill_probability, mean_ttk (over the trials with a kill)
+    - h_lost_per_turn: expected H this side lost in each turn
+    - expected_damage: expected H one volley removes from a fresh opponent
+    """
+    table = table or PenetrationTable(catalog.weapons)
+    units = [catalog.units_by_uuid[first_uuid], catalog.units_by_uuid[second_uuid]]
+    counts = tuple(volley_counts(table, split_ids(u.get("weapons")), units[1 - s], mode) for s, u in enumerate(units))
+    health = (_int_stat(units[0], "H"), _int_stat(units[1], "H"))
+
+    seeds = np.random.SeedSequence(seed).spawn(max(1, workers))
+    if workers > 1:
+        shares = [trials // workers + (i < trials % workers) for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_simulate, [counts] * workers, [health] * workers, shares,
+                                  [max_turns] * workers, [simultaneous] * workers, seeds))
+        ttk = sum(p["ttk"] for p in parts)
+        h_lost = sum(p["h_lost"] for p in parts)
+    else:
+        result = _simulate(counts, health, trials, max_turns, simultaneous, seeds[0])
+        ttk, h_lost = result["ttk"], result["h_lost"]
+
+    turns = np.arange(1, max_turns + 1)
+    sides = []
+    for s, unit in enumerate(units):
+        kills = int(ttk[s, :max_turns].sum())
+        sides.append({
+            "uuid": unit["uuid"],
+            "name": unit["name"],
+            "ttk": ttk[s],
+            "kill_probability": kills / trials,
+            "mean_ttk": float((ttk[s, :max_turns] * turns).sum() / kills) if kills else None,
+            "h_lost_per_turn": h_lost[s] / trials,
+            "expected_damage": float(counts[s].sum()) / DIE,
+        })
+    return {"trials": trials, "max_turns": max_turns, "mode": mode, "sides": sides}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate duels between two units")
+    parser.add_argument("first", help="uuid of the unit that fires first each turn")
+    parser.add_argument("second", help="uuid of the other unit")
+    parser.add_argument("--trials", type=int, default=DEFAULT_TRIALS)
+    parser.add_argument("--turns", type=int, default=DEFAULT_TURNS, help="turns before a duel counts as unresolved")
+    parser.add_argument("--mode", choices=MODES, default="salvo")
+    parser.add_argument("--simultaneous", action="store_true", help="both units fire before casualties are removed")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--workers", type=int, default=1, help="processes to split the trials over")
+    args = parser.parse_args(argv)
+
+    result = simulate_duel(load_catalog(), args.first, args.second, args.trials, args.turns, args.mode,
+                           args.simultaneous, args.seed, args.workers)
+    print(f"{result['trials']} duels, {result['mode']}, up to {result['max_turns']} turns")
+    for side in result["sides"]:
+        mean = f"{side['mean_ttk']:.2f}" if side["mean_ttk"] is not None else "-"
+        print(f"{side['name']}: kills {side['kill_probability']:.1%}, mean turns to kill {mean}, "
+              f"{side['expected_damage']:.3f} H per volley")
+        lost = ", ".join(f"{h:.3f}" for h in side["h_lost_per_turn"][:5])
+        print(f"  H lost per turn: {lost}{', ...' if result['max_turns'] > 5 else ''}")
+
+
+if __name__ == "__main__":
+    main()
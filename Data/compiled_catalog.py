@@ -0,0 +1,300 @@
+"""
+compiled_catalog.py
+
+Compact binary form of the four catalog CSVs, loadable via mmap.
+
+The compiled file (catalog.bin next to the CSVs) holds:
+- one interned string table (every distinct cell value stored once)
+- per table, one uint32 column of string ids per CSV field (lossless)
+- integer id relation lists in CSR form: unit -> weapons, unit -> tags,
+  weapon -> keywords, already split and resolved to row indexes
+- numeric stat columns (weapon R, unit M/C/H/MP/Mat; -1 where not a number)
+
+Opening it maps the file and decodes nothing up front; the string table is
+decoded on first use. open_compiled() rebuilds the file automatically when any source
+CSV's mtime or size no longer matches what it was compiled from. Sources are
+only hashed when that check cannot be trusted: a source modified within
+RACY_NS of the compile (it may have changed again in the same timestamp
+tick), or when asked to verify (e.g. after restoring files with their old
+mtimes); then their SHA-1 must match too.
+
+Materialising a full Catalog from the compiled file (to_catalog) costs about
+as much as parsing the CSVs, since the dict rows and indexes are rebuilt
+either way; the gain is for readers of column() / int_column() / related().
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from catalog import KEYWORDS_FILE, TAGS_FILE, UNITS_FILE, WEAPONS_FILE, Catalog, load_catalog, split_ids
+from edit_journal import JOURNAL_FILE
+
+COMPILED_FILE = "catalog.bin"
+MAGIC = b"LLCAT\x00\x00\x01"
+FORMAT_VERSION = 1
+ALIGN = 8
+# Sources modified this close to the compile are hashed when checked (covers
+# filesystems with coarse timestamps, e.g. 2 s on FAT)
+RACY_NS = 2 * 10**9
+
+# The editor's journal counts as a source: unsaved-to-CSV edits are compiled in
+SOURCE_FILES = {"units": UNITS_FILE, "weapons": WEAPONS_FILE, "tags": TAGS_FILE, "keywords": KEYWORDS_FILE,
+                "journal": JOURNAL_FILE}
+# (table, field, target table)
+RELATIONS = [("units", "weapons", "weapons"), ("units", "tags", "tags"), ("weapons", "keywords", "keywords")]
+NUMERIC_COLUMNS = {"units": ["M", "C", "H", "MP", "Mat"], "weapons": ["R"]}
+
+
+def _fingerprint(path: str, with_hash: bool = True) -> Optional[Dict]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    fp = {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+    if with_hash:
+        with open(path, "rb") as f:
+            fp["sha1"] = hashlib.sha1(f.read()).hexdigest()
+    return fp
+
+
+def _fieldnames(rows: List[Dict[str, str]]) -> List[str]:
+    names: List[str] = []
+    for row in rows:
+        for k in row:
+            if k not in names:
+                names.append(k)
+    return names
+
+
+def _to_int(value: str) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+def compile_catalog(data_dir: str = ".", out_path: Optional[str] = None) -> str:
+    """Compile the CSVs in data_dir into the binary format. Returns the output path."""
+    out_path = out_path or os.path.join(data_dir, COMPILED_FILE)
+    # Taken before reading the sources, so any write during the compile counts as racy
+    compiled_ns = time.time_ns()
+    sources = {name: _fingerprint(os.path.join(data_dir, fname)) for name, fname in SOURCE_FILES.items()}
+    catalog = load_catalog(data_dir)
+    tables = {"units": catalog.units, "weapons": catalog.weapons, "tags": catalog.tags, "keywords": catalog.keywords}
+
+    string_ids: Dict[str, int] = {}
+
+    def intern(value):
+        value = value if value is not None else ""
+        sid = string_ids.get(value)
+        if sid is None:
+            sid = string_ids[value] = len(string_ids)
+        return sid
+
+    sections: Dict[str, array] = {}
+    table_meta = {}
+    for name, rows in tables.items():
+        fields = _fieldnames(rows)
+        table_meta[name] = {"fields": fields, "rows": len(rows)}
+        for field in fields:
+            sections[f"{name}.{field}"] = array("I", (intern(r.get(field)) for r in rows))
+        for field in NUMERIC_COLUMNS.get(name, []):
+            sections[f"{name}.{field}#int"] = array("i", (_to_int(r.get(field)) for r in rows))
+
+    for table, field, target in RELATIONS:
+        index = {r["uuid"]: i for i, r in enumerate(tables[target])}
+        offsets = array("I", [0])
+        ids = array("I")
+        for row in tables[table]:
+            ids.extend(index[u] for u in split_ids(row.get(field)) if u in index)
+            offsets.append(len(ids))
+        sections[f"{table}.{field}@offsets"] = offsets
+        sections[f"{table}.{field}@ids"] = ids
+
+    # One UTF-8 blob with code point offsets, so it decodes in a single call
+    text = "".join(string_ids)  # dicts keep insertion order, i.e. id order
+    str_offsets = array("I", [0])
+    pos = 0
+    for value in string_ids:
+        pos += len(value)
+        str_offsets.append(pos)
+    sections["strings@offsets"] = str_offsets
+    blob = text.encode("utf-8")
+
+    # Lay out sections after the header; offsets are relative to the data start
+    layout = {}
+    payload = bytearray()
+    for name, arr in list(sections.items()) + [("strings@blob", array("B", bytes(blob)))]:
+        payload += b"\0" * (-len(payload) % ALIGN)
+        data = arr.tobytes()
+        layout[name] = [len(payload), len(data), arr.typecode]
+        payload += data
+
+    header = json.dumps({
+        "version": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "sources": sources,
+        "compiled_ns": compiled_ns,
+        "tables": table_meta,
+        "sections": layout,
+    }).encode("utf-8")
+    prefix = MAGIC + struct.pack("<I", len(header)) + header
+    prefix += b"\0" * (-len(prefix) % ALIGN)
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(prefix)
+        f.write(payload)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+class CompiledCatalog:
+    """Read-only, memory-mapped view of a compiled catalog file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a compiled catalog")
+        (header_len,) = struct.unpack_from("<I", self._mm, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(self._mm[start:start + header_len].decode("utf-8"))
+        data_start = start + header_len
+        self._data_start = data_start + (-data_start % ALIGN)
+        self._views: Dict[str, memoryview] = {}
+        self._text: Optional[str] = None
+        self._strings: Optional[List[str]] = None
+
+    def close(self):
+        for view in self._views.values():
+            view.release()
+        self._views.clear()
+        self._mm.close()
+
+    def _section(self, name: str) -> memoryview:
+        view = self._views.get(name)
+        if view is None:
+            offset, length, typecode = self.header["sections"][name]
+            offset += self._data_start
+            view = memoryview(self._mm)[offset:offset + length].cast(typecode)
+            self._views[name] = view
+        return view
+
+    def _decoded(self) -> str:
+        if self._text is None:
+            self._text = bytes(self._section("strings@blob")).decode("utf-8")
+        return self._text
+
+    def string(self, sid: int) -> str:
+        if self._strings is not None:
+            return self._strings[sid]
+        offsets = self._section("strings@offsets")
+        return self._decoded()[offsets[sid]:offsets[sid + 1]]
+
+    def strings(self) -> List[str]:
+        """The whole string table, indexed by string id."""
+        if self._strings is None:
+            text = self._decoded()
+            offsets = self._section("strings@offsets").tolist()
+            self._strings = [text[a:b] for a, b in zip(offsets, offsets[1:])]
+        return self._strings
+
+    # Table access
+
+    def fields(self, table: str) -> List[str]:
+        return self.header["tables"][table]["fields"]
+
+    def count(self, table: str) -> int:
+        return self.header["tables"][table]["rows"]
+
+    def column(self, table: str, field: str) -> memoryview:
+        """String ids of one field for every row."""
+        return self._section(f"{table}.{field}")
+
+    def int_column(self, table: str, field: str) -> memoryview:
+        """Numeric stat column (-1 where the cell is not an integer)."""
+        return self._section(f"{table}.{field}#int")
+
+    def related(self, table: str, field: str, row: int) -> memoryview:
+        """Row indexes of the entries referenced by row's relation field."""
+        offsets = self._section(f"{table}.{field}@offsets")
+        return self._section(f"{table}.{field}@ids")[offsets[row]:offsets[row + 1]]
+
+    def row(self, table: str, index: int) -> Dict[str, str]:
+        return {f: self.string(self.column(table, f)[index]) for f in self.fields(table)}
+
+    def rows(self, table: str) -> List[Dict[str, str]]:
+        fields = self.fields(table)
+        strings = self.strings()
+        columns = [[strings[i] for i in self.column(table, f).tolist()] for f in fields]
+        return [dict(zip(fields, values)) for values in zip(*columns)]
+
+    def to_catalog(self) -> Catalog:
+        return Catalog(self.rows("units"), self.rows("weapons"), self.rows("tags"), self.rows("keywords"))
+
+
+def is_stale(compiled_path: str, data_dir: str = ".", verify: bool = False) -> bool:
+    """
+    True if compiled_path is missing, from another format/platform, or its
+    sources changed. mtime and size are compared; a source whose mtime is
+    within RACY_NS of the compile, or every source when verify is set, is
+    also hashed and compared.
+    """
+    try:
+        with open(compiled_path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return True
+            (header_len,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_len).decode("utf-8"))
+    except (FileNotFoundError, struct.error, ValueError):
+        return True
+    if header.get("version") != FORMAT_VERSION or header.get("byteorder") != sys.byteorder:
+        return True
+    compiled_ns = header.get("compiled_ns")
+    if compiled_ns is None:
+        return True
+    for name, fname in SOURCE_FILES.items():
+        current = _fingerprint(os.path.join(data_dir, fname), with_hash=False)
+        if name not in header["sources"]:
+            return True
+        recorded = header["sources"][name]
+        if (current is None) != (recorded is None):
+            return True
+        if current is None:
+            continue
+        if (current["mtime_ns"], current["size"]) != (recorded["mtime_ns"], recorded["size"]):
+            return True
+        if verify or current["mtime_ns"] >= compiled_ns - RACY_NS:
+            if _fingerprint(os.path.join(data_dir, fname))["sha1"] != recorded.get("sha1"):
+                return True
+    return False
+
+
+def open_compiled(data_dir: str = ".", path: Optional[str] = None, verify: bool = False) -> CompiledCatalog:
+    """Open the compiled catalog for data_dir, (re)building it first if stale (see is_stale)."""
+    path = path or os.path.join(data_dir, COMPILED_FILE)
+    if is_stale(path, data_dir, verify):
+        compile_catalog(data_dir, path)
+    return CompiledCatalog(path)
+
+
+def load_catalog_compiled(data_dir: str = ".", verify: bool = False) -> Catalog:
+    """Drop-in for catalog.load_catalog that goes through the compiled file."""
+    compiled = open_compiled(data_dir, verify=verify)
+    try:
+        return compiled.to_catalog()
+    finally:
+        compiled.close()
+
+
+if __name__ == "__main__":
+    print("Wrote", compile_catalog())
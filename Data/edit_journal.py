@@ -0,0 +1,132 @@
+"""
+edit_journal.py
+
+Append-only journal of editor saves.
+
+Each save is recorded as one JSON line holding the full saved row, so a save
+costs O(1) regardless of catalog size. The journal is folded back into the
+CSVs by compact(), which writes every CSV through a temp file + rename so a
+crash can never leave a truncated CSV behind. Until then, readers replay the
+journal on top of the CSVs (catalog.load_catalog does this).
+
+Replaying is an upsert by uuid, so it is idempotent: a crash between
+rewriting the CSVs and truncating the journal is harmless.
+"""
+
+import csv
+import json
+import os
+from typing import Dict, Iterator, List, Tuple
+
+JOURNAL_FILE = "catalog.journal"
+
+
+def write_csv_atomic(path: str, rows: List[Dict[str, str]], fieldnames: List[str]):
+    # Keep any extra columns rows may carry after the known ones
+    fieldnames = list(fieldnames)
+    for row in rows:
+        for k in row:
+            if k not in fieldnames:
+                fieldnames.append(k)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_journal(path: str = JOURNAL_FILE) -> Iterator[Tuple[str, Dict[str, str]]]:
+    """
+    Yield (table, row) entries. A line torn by a crash is skipped, even one
+    cut inside a multi-byte character: lines are decoded one at a time.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            try:
+                entry = json.loads(line.decode("utf-8"))
+                table, row = entry["table"], entry["row"]
+            except (ValueError, KeyError, TypeError):
+                continue
+            yield table, row
+
+
+def replay_journal(tables: Dict[str, List[Dict[str, str]]], path: str = JOURNAL_FILE) -> int:
+    """Apply journaled rows onto the loaded tables (upsert by uuid). Returns entry count."""
+    positions: Dict[str, Dict[str, int]] = {}
+    count = 0
+    for table, row in read_journal(path):
+        rows = tables.get(table)
+        if rows is None:
+            continue
+        index = positions.get(table)
+        if index is None:
+            index = positions[table] = {r["uuid"]: i for i, r in enumerate(rows)}
+        i = index.get(row["uuid"])
+        if i is None:
+            index[row["uuid"]] = len(rows)
+            rows.append(dict(row))
+        else:
+            rows[i].update(row)
+        count += 1
+    return count
+
+
+class EditJournal:
+    """Appends saves to the journal and compacts them into the CSVs."""
+
+    def __init__(self, path: str = JOURNAL_FILE):
+        self.path = path
+        self._file = None
+        self.pending = 0
+        self.dirty = set()  # tables with journaled rows not yet in their CSV
+        for table, _ in read_journal(path):
+            self.pending += 1
+            self.dirty.add(table)
+
+    def record(self, table: str, row: Dict[str, str]):
+        if self._file is None:
+            # Binary, so the byte checks below never land inside a character
+            self._file = open(self.path, "a+b")
+            # Terminate a line torn by an earlier crash so this entry stays readable
+            end = self._file.seek(0, os.SEEK_END)
+            if end > 0:
+                self._file.seek(end - 1)
+                if self._file.read(1) != b"\n":
+                    self._file.write(b"\n")
+        line = json.dumps({"table": table, "row": row}, ensure_ascii=False) + "\n"
+        self._file.write(line.encode("utf-8"))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.pending += 1
+        self.dirty.add(table)
+
+    def compact(self, tables: Dict[str, Tuple[str, List[Dict[str, str]], List[str]]]):
+        """
+        Rewrite the CSVs of journaled tables from memory, then empty the journal.
+
+        tables maps a table name to (csv_path, rows, fieldnames); the rows must
+        already include every journaled change.
+        """
+        missing = self.dirty - set(tables)
+        if missing:
+            raise ValueError(f"Cannot compact journal: no rows given for {', '.join(sorted(missing))}")
+        for name in self.dirty:
+            path, rows, fieldnames = tables[name]
+            write_csv_atomic(path, rows, fieldnames)
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.pending = 0
+        self.dirty.clear()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
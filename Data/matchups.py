@@ -0,0 +1,259 @@
+"""
+matchups.py
+
+Attacker x defender matchup matrix over every unit of the catalog.
+
+For each pair the matrix holds the expected H one Salvo removes and the
+expected number of Salvos needed to kill the defender, both exact (salvo_dp). A defender only
+matters through its armor class, H and Brittle, so every attacker is
+evaluated once per distinct defender profile and the results are spread over
+the columns.
+
+Results are cached (CACHE_FILE, JSON) keyed by a content hash of the
+attacker's weapon loadout and the defender profile, so reruns after an edit
+only evaluate loadouts that changed. Within a session, update_weapon() and
+update_unit() recompute just the rows and columns an edit touches, found
+through the catalog's weapon -> units index.
+
+Usage: python matchups.py [--metric ttk] [--csv out.csv] [--svg out.svg]
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from catalog import Catalog, load_catalog, split_ids
+from combat_sim import BRITTLE
+from edit_journal import write_csv_atomic
+from penetration import ARMOR_CLASSES, ARMOR_INDEX, UP, PenetrationTable, success_counts
+from salvo_dp import expected_damage, expected_turns_to_kill
+
+CACHE_FILE = ".matchup_cache.json"
+# Bump when the evaluation changes, so cached results are not reused
+FORMAT_VERSION = 2
+METRICS = ("damage", "ttk")
+
+
+def loadout_key(catalog: Catalog, unit: Dict[str, str]) -> str:
+    """Content hash of the penetration stats of every weapon the unit fires."""
+    weapons = [catalog.weapons_by_uuid.get(wid) for wid in split_ids(unit.get("weapons"))]
+    payload = json.dumps([FORMAT_VERSION] + [[w.get(a) for a in ARMOR_CLASSES] for w in weapons if w])
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def defender_profile(unit: Dict[str, str]) -> str:
+    """Everything about a defender the evaluation reads: armor class, H and Brittle."""
+    if unit.get("A") not in ARMOR_INDEX:
+        raise ValueError(f"{unit['name']}: unknown armor class {unit.get('A')!r}")
+    try:
+        health = int(unit.get("H") or 0)
+    except ValueError:
+        raise ValueError(f"{unit['name']}: H must be a number, got {unit.get('H')!r}") from None
+    return f"{unit['A']}:{health}:{int(BRITTLE in (unit.get('abilities') or ''))}"
+
+
+def _parse_profile(profile: str) -> Tuple[int, int, int]:
+    armor, health, brittle = profile.split(":")
+    return ARMOR_INDEX[armor], int(health), int(brittle)
+
+
+def evaluate(counts: np.ndarray, health: int) -> Tuple[float, float]:
+    """
+    (expected H removed per Salvo, expected Salvos to kill) for weapons with
+    these penetrating face counts against a defender with this much H.
+
+    Both are exact (see salvo_dp); damage is capped at the defender's H and
+    the time to kill is inf if the loadout cannot penetrate.
+    """
+    counts = counts.tolist()
+    return expected_damage(counts, health), expected_turns_to_kill(counts, health)
+
+
+class MatchupMatrix:
+    """
+    damage[i, j] / ttk[i, j]: unit i (in catalog order) attacking unit j.
+
+    Call compute() once, then update_weapon() / update_unit() for edits.
+    """
+
+    def __init__(self, catalog: Catalog, cache_path: Optional[str] = CACHE_FILE):
+        self.catalog = catalog
+        self.cache_path = cache_path
+        self.table = PenetrationTable(catalog.weapons)
+        self._refresh_counts()
+        self._cache: Dict[str, Dict[str, List[float]]] = {}
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == FORMAT_VERSION:
+                self._cache = data["entries"]
+        self.units: List[Dict[str, str]] = []
+        self.damage = np.zeros((0, 0))
+        self.ttk = np.zeros((0, 0))
+
+    def _refresh_counts(self):
+        # Faces that penetrate, per weapon x armor class, against normal and Brittle targets
+        threshold, direction = self.table.threshold, self.table.direction
+        self._counts = [success_counts(threshold, direction),
+                        success_counts(threshold, direction, np.where(direction == UP, 1, 0))]
+
+    def _attacker_values(self, unit: Dict[str, str], profiles) -> Tuple[Dict[str, List[float]], int]:
+        """Values of this attacker against each profile; returns (values, evaluated count)."""
+        cached = self._cache.setdefault(loadout_key(self.catalog, unit), {})
+        evaluated = 0
+        missing = [p for p in profiles if p not in cached]
+        if missing:
+            rows = self.table.rows([w for w in split_ids(unit.get("weapons")) if w in self.table.index])
+            for profile in missing:
+                armor, health, brittle = _parse_profile(profile)
+                cached[profile] = list(evaluate(self._counts[brittle][rows, armor], health))
+                evaluated += 1
+        return cached, evaluated
+
+    def _fill_row(self, i: int) -> int:
+        values, evaluated = self._attacker_values(self.units[i], set(self._profiles))
+        self.damage[i] = [values[p][0] for p in self._profiles]
+        self.ttk[i] = [values[p][1] for p in self._profiles]
+        return evaluated
+
+    def _fill_column(self, j: int) -> int:
+        evaluated = 0
+        profile = self._profiles[j]
+        for i, unit in enumerate(self.units):
+            values, n = self._attacker_values(unit, [profile])
+            self.damage[i, j], self.ttk[i, j] = values[profile]
+            evaluated += n
+        return evaluated
+
+    def compute(self) -> Tuple[int, int]:
+        """Fill the whole matrix. Returns (pairs evaluated, pairs taken from the cache)."""
+        self.units = list(self.catalog.units)
+        self._position = {u["uuid"]: i for i, u in enumerate(self.units)}
+        self._profiles = [defender_profile(u) for u in self.units]
+        n = len(self.units)
+        self.damage = np.zeros((n, n))
+        self.ttk = np.zeros((n, n))
+        distinct = len(set(self._profiles))
+        evaluated = sum(self._fill_row(i) for i in range(n))
+        return evaluated, n * distinct - evaluated
+
+    def update_weapon(self, row: Dict[str, str]) -> List[str]:
+        """Apply an edited weapon row; recomputes the rows of the units carrying it. Returns their uuids."""
+        weapon = self.catalog.upsert_weapon(row)
+        self.table.upsert(weapon)
+        self._refresh_counts()
+        affected = list(dict.fromkeys(self.catalog.units_by_weapon.get(weapon["uuid"], [])))
+        for uid in affected:
+            self._fill_row(self._position[uid])
+        return affected
+
+    def update_unit(self, row: Dict[str, str]):
+        """Apply an edited (or new) unit row; recomputes its row and column."""
+        unit = self.catalog.upsert_unit(row)
+        j = self._position.get(unit["uuid"])
+        if j is None:
+            j = self._position[unit["uuid"]] = len(self.units)
+            self.units.append(unit)
+            self._profiles.append(defender_profile(unit))
+            self.damage = np.pad(self.damage, ((0, 1), (0, 1)))
+            self.ttk = np.pad(self.ttk, ((0, 1), (0, 1)))
+        else:
+            self._profiles[j] = defender_profile(unit)
+        self._fill_column(j)
+        self._fill_row(j)
+
+    def save_cache(self):
+        if not self.cache_path:
+            return
+        # Only keep loadouts still in the catalog
+        live = {loadout_key(self.catalog, u) for u in self.units}
+        entries = {k: v for k, v in self._cache.items() if k in live}
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": FORMAT_VERSION, "entries": entries}, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def metric(self, name: str) -> np.ndarray:
+        if name not in METRICS:
+            raise ValueError(f"Unknown metric {name!r} (expected one of {', '.join(METRICS)})")
+        return self.damage if name == "damage" else self.ttk
+
+
+# Export
+
+def _format(value: float) -> str:
+    return "inf" if math.isinf(value) else f"{value:.3f}"
+
+
+def write_matrix_csv(matrix: MatchupMatrix, path: str, metric: str = "damage"):
+    values = matrix.metric(metric)
+    names = [u["name"] for u in matrix.units]
+    header = ["attacker"] + names
+    rows = [dict(zip(header, [name] + [_format(v) for v in values[i]])) for i, name in enumerate(names)]
+    write_csv_atomic(path, rows, header)
+
+
+def _color(t: float) -> str:
+    # White (low) to red (high)
+    g = int(round(255 * (1 - t)))
+    return f"#ff{g:02x}{g:02x}"
+
+
+def write_matrix_svg(matrix: MatchupMatrix, path: str, metric: str = "damage", cell: int = 18):
+    """Heatmap of one metric; attackers are rows, defenders columns. Unkillable pairs are grey."""
+    values = matrix.metric(metric)
+    names = [u["name"] for u in matrix.units]
+    n = len(names)
+    label = 8 * max((len(name) for name in names), default=0) + 10
+    finite = values[np.isfinite(values)]
+    top = float(finite.max()) if finite.size else 1.0
+    width = height = label + n * cell
+
+    out = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height + 20}" '
+           f'font-family="sans-serif" font-size="11">',
+           f'<text x="4" y="14">{escape(metric)}: rows attack columns (max {top:.2f})</text>',
+           f'<g transform="translate(0, 20)">']
+    for k, name in enumerate(names):
+        pos = label + k * cell + cell * 0.7
+        out.append(f'<text x="{label - 4}" y="{pos:.1f}" text-anchor="end">{escape(name)}</text>')
+        out.append(f'<text transform="translate({pos:.1f}, {label - 4}) rotate(-90)">{escape(name)}</text>')
+    for i in range(n):
+        for j in range(n):
+            v = values[i, j]
+            fill = "#bbbbbb" if math.isinf(v) else _color(v / top if top else 0.0)
+            out.append(f'<rect x="{label + j * cell}" y="{label + i * cell}" width="{cell}" height="{cell}" '
+                       f'fill="{fill}"><title>{escape(names[i])} vs {escape(names[j])}: {_format(v)}</title></rect>')
+    out.append("</g></svg>")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(out))
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the attacker x defender matchup matrix")
+    parser.add_argument("--metric", choices=METRICS, default="damage")
+    parser.add_argument("--csv", help="CSV output (default matchups_<metric>.csv)")
+    parser.add_argument("--svg", help="SVG heatmap output (default matchups_<metric>.svg)")
+    parser.add_argument("--cache", default=CACHE_FILE, help="result cache, or '' to disable")
+    args = parser.parse_args(argv)
+
+    matrix = MatchupMatrix(load_catalog(), args.cache or None)
+    evaluated, reused = matrix.compute()
+    matrix.save_cache()
+    csv_path = args.csv or f"matchups_{args.metric}.csv"
+    svg_path = args.svg or f"matchups_{args.metric}.svg"
+    write_matrix_csv(matrix, csv_path, args.metric)
+    write_matrix_svg(matrix, svg_path, args.metric)
+    print(f"Wrote {csv_path} and {svg_path} ({evaluated} evaluated, {reused} cached)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+penetration.py
+
+Penetration rolls of the weapon table as NumPy arrays.
+
+Every weapon's N/L/M/H cell ("5+", "12-", "NA") is parsed once into an
+integer threshold and a direction (Rolling Up / Rolling Down, see
+RuleBook/Game Rules.md), so success chances for every weapon x armor class
+come out of a single array operation:
+
+- Rolling Up "T+":   success if d12 + modifier >= T
+- Rolling Down "T-": success if d12 + modifier <= T
+- "NA":              the weapon cannot penetrate that armor
+
+The Shot minor caps the roll at 4- / 9+ before rolling. The modifier is added
+to the rolled value, as the rules put it, so a +1 helps when rolling up and
+hurts when rolling down.
+
+F is not an armor class but the weapon's fortification damage; it is kept as
+an integer column (0 for "NA").
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DIE = 12
+ARMOR_CLASSES = ("N", "L", "M", "H")
+ARMOR_INDEX = {a: i for i, a in enumerate(ARMOR_CLASSES)}
+
+# Direction codes
+NA, UP, DOWN = 0, 1, -1
+
+# Shot: "at most a 4- or 9+"
+SHOT_UP_CAP = 9
+SHOT_DOWN_CAP = 4
+
+
+def parse_roll(value: Optional[str]) -> Tuple[int, int]:
+    """Parse one penetration cell into (threshold, direction); "NA" and blanks are (0, NA)."""
+    value = (value or "").strip()
+    if not value or value.upper() == "NA":
+        return 0, NA
+    direction = {"+": UP, "-": DOWN}.get(value[-1])
+    if direction is None or not value[:-1].isdigit():
+        raise ValueError(f"Invalid penetration roll {value!r} (expected e.g. '5+', '12-' or 'NA')")
+    return int(value[:-1]), direction
+
+
+def parse_fortification(value: Optional[str]) -> int:
+    value = (value or "").strip()
+    if not value or value.upper() == "NA":
+        return 0
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Invalid fortification damage {value!r} (expected a number or 'NA')") from None
+
+
+def success_counts(threshold: np.ndarray, direction: np.ndarray, modifier=0, shot: bool = False) -> np.ndarray:
+    """
+    Number of d12 faces (0-12) that penetrate, elementwise.
+
+    threshold and direction are same-shaped int arrays; modifier broadcasts
+    against them (a scalar, a per-weapon column or a per-armor row).
+    """
+    threshold = np.asarray(threshold, dtype=np.int16)
+    direction = np.asarray(direction, dtype=np.int8)
+    if shot:
+        threshold = np.where(direction == UP, np.maximum(threshold, SHOT_UP_CAP),
+                             np.where(direction == DOWN, np.minimum(threshold, SHOT_DOWN_CAP), threshold))
+    # The roll needed on the die once the modifier is added to it
+    needed = threshold - np.asarray(modifier, dtype=np.int16)
+    up = np.clip(DIE + 1 - needed, 0, DIE)
+    down = np.clip(needed, 0, DIE)
+    return np.where(direction == UP, up, np.where(direction == DOWN, down, 0)).astype(np.int8)
+
+
+def success_probability(threshold: np.ndarray, direction: np.ndarray, modifier=0, shot: bool = False) -> np.ndarray:
+    """Chance that one roll penetrates, elementwise (see success_counts)."""
+    return success_counts(threshold, direction, modifier, shot) / DIE
+
+
+class PenetrationTable:
+    """
+    Parsed penetration rolls for a list of weapons.
+
+    threshold, direction: int arrays of shape (weapons, 4), columns in ARMOR_CLASSES order
+    fortification:        int array of shape (weapons,)
+    """
+
+    def __init__(self, weapons: Sequence[Dict[str, str]]):
+        self.uuids: List[str] = [w["uuid"] for w in weapons]
+        self.index: Dict[str, int] = {uid: i for i, uid in enumerate(self.uuids)}
+        n = len(weapons)
+        self.threshold = np.zeros((n, len(ARMOR_CLASSES)), dtype=np.int16)
+        self.direction = np.zeros((n, len(ARMOR_CLASSES)), dtype=np.int8)
+        self.fortification = np.zeros(n, dtype=np.int16)
+        self.range = np.zeros(n, dtype=np.int16)
+
+        # The table only holds a few dozen distinct cells; parse each once
+        self._parsed: Dict[str, Tuple[int, int]] = {}
+        for i, w in enumerate(weapons):
+            self._set_row(i, w)
+
+    def _set_row(self, i: int, w: Dict[str, str]):
+        for j, armor in enumerate(ARMOR_CLASSES):
+            cell = w.get(armor) or ""
+            roll = self._parsed.get(cell)
+            if roll is None:
+                try:
+                    roll = self._parsed[cell] = parse_roll(cell)
+                except ValueError as e:
+                    raise ValueError(f"{w.get('name', w['uuid'])}, {armor}: {e}") from None
+            self.threshold[i, j], self.direction[i, j] = roll
+        try:
+            self.fortification[i] = parse_fortification(w.get("F"))
+        except ValueError as e:
+            raise ValueError(f"{w.get('name', w['uuid'])}, F: {e}") from None
+        r = (w.get("R") or "").strip()
+        self.range[i] = int(r) if r.isdigit() else 0
+
+    def upsert(self, weapon: Dict[str, str]) -> int:
+        """Re-parse one weapon row (appending it if new); returns its row index."""
+        i = self.index.get(weapon["uuid"])
+        if i is None:
+            i = self.index[weapon["uuid"]] = len(self.uuids)
+            self.uuids.append(weapon["uuid"])
+            self.threshold = np.vstack([self.threshold, np.zeros((1, len(ARMOR_CLASSES)), dtype=np.int16)])
+            self.direction = np.vstack([self.direction, np.zeros((1, len(ARMOR_CLASSES)), dtype=np.int8)])
+            self.fortification = np.append(self.fortification, np.int16(0))
+            self.range = np.append(self.range, np.int16(0))
+        self._set_row(i, weapon)
+        return i
+
+    def __len__(self):
+        return len(self.uuids)
+
+    def rows(self, weapon_uuids: Sequence[str]) -> np.ndarray:
+        """Row indexes for these weapons (KeyError on unknown uuids)."""
+        return np.fromiter((self.index[u] for u in weapon_uuids), dtype=np.intp, count=len(weapon_uuids))
+
+    def counts(self, modifier=0, shot: bool = False) -> np.ndarray:
+        """Penetrating d12 faces, shape (weapons, 4)."""
+        return success_counts(self.threshold, self.direction, modifier, shot)
+
+    def probabilities(self, modifier=0, shot: bool = False) -> np.ndarray:
+        """Penetration chance for every weapon x armor class, shape (weapons, 4)."""
+        return self.counts(modifier, shot) / DIE
+
+    def probability(self, weapon_uuid: str, armor: str, modifier: int = 0, shot: bool = False) -> float:
+        i, j = self.index[weapon_uuid], ARMOR_INDEX[armor]
+        return float(success_counts(self.threshold[i, j], self.direction[i, j], modifier, shot)) / DIE
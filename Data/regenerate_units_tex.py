@@ -1,50 +1,36 @@
-import csv
+import argparse
+import sys
 
+from catalog import load_catalog
+from compiled_catalog import load_catalog_compiled
+from tex_export import CACHE_DIR, export_units_tex, export_units_tex_incremental
 
-def load_csv(path):
-    try:
-        with open(path, newline='', encoding='utf-8') as f:
-            return list(csv.DictReader(f))
-    except FileNotFoundError:
-        return []
 
-units = load_csv('units.csv')
-weapons = load_csv('weapons.csv')
-tags = load_csv('tags.csv')
-keywords = load_csv('keywords.csv')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Regenerate units.tex from the catalog CSVs")
+    parser.add_argument('-o', '--output', default='units.tex',
+                        help="output file, or '-' to stream to stdout (e.g. piped into LaTeX)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only re-render cards whose content changed since the last export")
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help="fragment cache used by --incremental")
+    parser.add_argument('--compiled', action='store_true',
+                        help="load through the compiled catalog.bin (rebuilt when the CSVs change)")
+    parser.add_argument('--verify', action='store_true',
+                        help="with --compiled, hash the CSVs to detect changes that kept their mtime and size")
+    args = parser.parse_args(argv)
 
-tex_content = ''
-for unit in units:
-    unit_weapons = []
-    if unit.get('weapons'):
-        weapon_ids = [w for w in unit['weapons'].split(',') if w]
-        unit_weapons = [w for w in weapons if w['uuid'] in weapon_ids]
-    weapon_rows = ''
-    for w in unit_weapons:
-        kw_field = w.get('keywords','')
-        if kw_field:
-            kw_ids = [k for k in kw_field.split(',') if k]
-            kw_names = [kobj['name'] for kobj in keywords if kobj['uuid'] in kw_ids]
-            keywords_str = ', '.join(kw_names)
-        else:
-            keywords_str = ''
-        weapon_rows += f"{w.get('name','')} & {w.get('R','-')} & {w.get('N','-')} & {w.get('L','-')} & {w.get('M','-')} & {w.get('H','-')} & {w.get('F','-')} & {keywords_str} \\\\ \hline\n"
-    tags_str = ''
-    if unit.get('tags'):
-        tag_ids = [t for t in unit['tags'].split(',') if t]
-        tag_names = [tobj['name'] for tobj in tags if tobj['uuid'] in tag_ids]
-        tags_str = ', '.join(tag_names)
-    tex_content += "\\unitcard{" + unit.get('name','') + "}{" + unit.get('subtitle','') + "}{" + unit.get('M','-') + "}{" + unit.get('A','-') + "}{" + unit.get('C','-') + "}{" + unit.get('H','-') + "}{" + unit.get('MP','-') + "}{" + unit.get('Mat','-') + "}{" + tags_str + "}\n"
+    # Keep stdout clean for the TeX stream when writing to it
+    log = sys.stderr if args.output == '-' else sys.stdout
+    name = 'stdout' if args.output == '-' else args.output
 
-    # Abilities injection: use 'None' when empty; convert newlines to LaTeX line breaks
-    abilities_raw = unit.get('abilities', '') or ''
-    abilities_text = abilities_raw.strip()
-    if not abilities_text:
-        abilities_text = 'None'
+    catalog = load_catalog_compiled(verify=args.verify) if args.compiled else load_catalog()
+    if args.incremental:
+        rendered, reused = export_units_tex_incremental(catalog, args.output, args.cache_dir)
+        print(f'Wrote {name} ({rendered} rendered, {reused} cached)', file=log)
     else:
-        abilities_text = abilities_text.replace('\n', ' \\\\ ')
+        export_units_tex(catalog, args.output)
+        print(f'Wrote {name}', file=log)
 
-    tex_content += "\\weapontable{" + weapon_rows + "}{" + abilities_text + "}\n\n"
-with open('units.tex','w',encoding='utf-8') as f:
-    f.write(tex_content)
-print('Wrote units.tex')
+
+if __name__ == '__main__':
+    main()
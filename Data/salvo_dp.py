@@ -0,0 +1,166 @@
+"""
+salvo_dp.py
+
+Exact damage distributions for a Salvo, by dynamic programming.
+
+A Salvo fires every weapon once; weapon k penetrates on c_k of the 12 faces
+of its d12 and each penetration removes 1 H. The H removed is therefore a
+sum of independent Bernoulli(c_k / 12) trials (a Poisson-binomial), which is
+convolved weapon by weapon and capped at the target's H. The convolution is
+done on integer face counts (denominator 12^weapons), so it is exact.
+
+Over several turns, remaining H is a Markov chain driven by that
+distribution, which gives kill probabilities by turn and the exact expected
+number of Salvos to kill.
+
+Everything is memoized on (sorted face counts, H). The face counts of a
+loadout against an armor class are the (weapon multiset, armor) part of the
+key, but by content: editing a weapon changes the key instead of leaving a
+stale entry behind.
+
+Usage: python salvo_dp.py <attacker uuid> <defender uuid> [--turns N]
+"""
+
+import argparse
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+from catalog import Catalog, load_catalog, split_ids
+from combat_sim import BRITTLE
+from penetration import ARMOR_INDEX, DIE, UP, PenetrationTable, success_counts
+
+CACHE_SIZE = 1 << 16
+
+
+def _key(counts: Sequence[int]) -> Tuple[int, ...]:
+    # Order does not change the sum; sorting lets equal multisets share entries
+    return tuple(sorted(int(c) for c in counts))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _distribution(counts: Tuple[int, ...], health: int) -> Tuple[int, ...]:
+    """Numerators over 12 ** len(counts) of P(damage = d), d = 0..health (last entry: >= health)."""
+    dist = [1] + [0] * health
+    for c in counts:
+        miss = DIE - c
+        new = [0] * (health + 1)
+        for d, ways in enumerate(dist):
+            if not ways:
+                continue
+            new[d] += ways * miss
+            new[min(d + 1, health)] += ways * c
+        dist = new
+    return tuple(dist)
+
+
+def salvo_distribution(counts: Sequence[int], health: int) -> List[float]:
+    """P(H removed = d) for d = 0..health, the last entry absorbing everything >= health."""
+    key = _key(counts)
+    total = DIE ** len(key)
+    return [ways / total for ways in _distribution(key, health)]
+
+
+def expected_damage(counts: Sequence[int], health: int) -> float:
+    """Expected H removed by one Salvo, capped at the target's H."""
+    return sum(d * p for d, p in enumerate(salvo_distribution(counts, health)))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _kill_curve(counts: Tuple[int, ...], health: int, turns: int) -> Tuple[float, ...]:
+    dist = salvo_distribution(counts, health)
+    # alive[h]: probability the target has exactly h H left (h = 1..health)
+    alive = [0.0] * (health + 1)
+    alive[health] = 1.0
+    dead = 0.0
+    curve = []
+    for _ in range(turns):
+        nxt = [0.0] * (health + 1)
+        for h in range(1, health + 1):
+            p = alive[h]
+            if not p:
+                continue
+            # Damage d leaves h - d; anything >= h kills
+            for d in range(h):
+                nxt[h - d] += p * dist[d]
+            dead += p * sum(dist[h:])
+        alive = nxt
+        curve.append(dead)
+    return tuple(curve)
+
+
+def kill_probabilities(counts: Sequence[int], health: int, turns: int) -> List[float]:
+    """P(target dead by the end of turn t), t = 1..turns, firing one Salvo per turn."""
+    if health <= 0:
+        return [1.0] * turns
+    return list(_kill_curve(_key(counts), health, turns))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _expected_turns(counts: Tuple[int, ...], health: int) -> float:
+    dist = salvo_distribution(counts, health)
+    if dist[0] >= 1.0:
+        return float("inf")
+    # E[h] = (1 + sum_{1 <= d < h} P(d) E[h - d]) / (1 - P(0)); a Salvo dealing
+    # >= h ends the fight. dist is capped at health, which is >= every h here.
+    expected = [0.0] * (health + 1)
+    for h in range(1, health + 1):
+        rest = sum(dist[d] * expected[h - d] for d in range(1, h))
+        expected[h] = (1.0 + rest) / (1.0 - dist[0])
+    return expected[health]
+
+
+def expected_turns_to_kill(counts: Sequence[int], health: int) -> float:
+    """Exact expected number of Salvos to kill (inf if the loadout cannot penetrate)."""
+    if health <= 0:
+        return 0.0
+    return _expected_turns(_key(counts), health)
+
+
+def loadout_counts(table: PenetrationTable, weapon_uuids: Sequence[str], armor: str,
+                   brittle: bool = False, shot: bool = False) -> List[int]:
+    """Penetrating faces of each weapon of a loadout against one armor class."""
+    j = ARMOR_INDEX[armor]
+    rows = table.rows([u for u in weapon_uuids if u in table.index])
+    threshold, direction = table.threshold[rows, j], table.direction[rows, j]
+    modifier = (direction == UP).astype(int) if brittle else 0
+    return success_counts(threshold, direction, modifier, shot).tolist()
+
+
+def matchup(catalog: Catalog, attacker_uuid: str, defender_uuid: str, turns: int = 10,
+            table: PenetrationTable = None) -> Dict:
+    """Exact Salvo statistics of one unit firing at another."""
+    table = table or PenetrationTable(catalog.weapons)
+    attacker = catalog.units_by_uuid[attacker_uuid]
+    defender = catalog.units_by_uuid[defender_uuid]
+    health = int(defender.get("H") or 0)
+    counts = loadout_counts(table, split_ids(attacker.get("weapons")), defender["A"],
+                            brittle=BRITTLE in (defender.get("abilities") or ""))
+    return {
+        "distribution": salvo_distribution(counts, health),
+        "expected_damage": expected_damage(counts, health),
+        "kill_by_turn": kill_probabilities(counts, health, turns),
+        "expected_turns": expected_turns_to_kill(counts, health),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exact Salvo damage and kill probabilities")
+    parser.add_argument("attacker", help="uuid of the firing unit")
+    parser.add_argument("defender", help="uuid of the target unit")
+    parser.add_argument("--turns", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    catalog = load_catalog()
+    result = matchup(catalog, args.attacker, args.defender, args.turns)
+    names = [catalog.units_by_uuid[u]["name"] for u in (args.attacker, args.defender)]
+    print(f"{names[0]} -> {names[1]}")
+    last = len(result["distribution"]) - 1
+    for d, p in enumerate(result["distribution"]):
+        print(f"  {d}{'+' if d == last and d else ''} H: {p:.4f}")
+    print(f"Expected damage per Salvo: {result['expected_damage']:.4f}")
+    print("Killed by turn: " + ", ".join(f"{t}: {p:.3f}" for t, p in enumerate(result["kill_by_turn"], 1)))
+    print(f"Expected Salvos to kill: {result['expected_turns']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
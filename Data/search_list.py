@@ -0,0 +1,202 @@
+"""
+search_list.py
+
+Searchable list pieces for the editor's pickers.
+
+- SearchIndex: substring search over a fixed list of names, backed by
+  casefolded keys and a trigram index (each posting list is built on first
+  use), refining the previous result when the query only grew.
+- VirtualListbox: a Listbox that only holds the rows currently in view, so
+  filtering or scrolling through tens of thousands of entries costs
+  O(visible rows) in Tk.
+- SelectionModel: the set of selected uuids of a multi-select picker, with
+  rows addressed by item index; changes report the item indexes that flipped
+  so only those rows are redrawn.
+"""
+
+import tkinter as tk
+import tkinter.font as tkfont
+from tkinter import ttk
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+GRAM = 3
+# Delay between the last keystroke and filtering
+DEBOUNCE_MS = 80
+
+
+class SearchIndex:
+    """Case-insensitive substring search returning item indexes in list order."""
+
+    def __init__(self, names: Sequence[str]):
+        self.keys = [n.casefold() for n in names]
+        self._grams: Dict[str, List[int]] = {}
+        self._last_query = ""
+        self._last_rows: List[int] = []
+
+    def _postings(self, gram: str) -> List[int]:
+        rows = self._grams.get(gram)
+        if rows is None:
+            rows = self._grams[gram] = [i for i, key in enumerate(self.keys) if gram in key]
+        return rows
+
+    def search(self, query: str) -> List[int]:
+        q = query.casefold()
+        if not q:
+            return list(range(len(self.keys)))
+
+        # Matches of a longer query are a subset of the matches of any part of it
+        if self._last_query and self._last_query in q:
+            candidates = self._last_rows
+        elif len(q) >= GRAM:
+            # Narrowest known trigram of the query, else index the first one
+            grams = [q[j:j + GRAM] for j in range(len(q) - GRAM + 1)]
+            known = [self._grams[g] for g in grams if g in self._grams]
+            candidates = min(known, key=len) if known else self._postings(grams[0])
+        else:
+            candidates = range(len(self.keys))
+
+        keys = self.keys
+        rows = [i for i in candidates if q in keys[i]]
+        self._last_query, self._last_rows = q, rows
+        return rows
+
+
+class SelectionModel:
+    """Selected uuids of one picker. Items are addressed by index, so duplicate names are safe."""
+
+    def __init__(self, uuids: Sequence[str]):
+        self.uuids = list(uuids)
+        self._position: Dict[str, int] = {}
+        self._items_by_uuid: Dict[str, List[int]] = {}
+        for i, uid in enumerate(self.uuids):
+            self._position.setdefault(uid, i)
+            self._items_by_uuid.setdefault(uid, []).append(i)
+        self.selected: Set[str] = set()
+
+    def is_selected(self, item: int) -> bool:
+        return self.uuids[item] in self.selected
+
+    def toggle(self, item: int) -> List[int]:
+        """Flip one item; returns the item indexes whose state changed."""
+        uid = self.uuids[item]
+        if uid in self.selected:
+            self.selected.remove(uid)
+        else:
+            self.selected.add(uid)
+        return self._items_by_uuid[uid]
+
+    def set(self, uuids: Iterable[str]) -> List[int]:
+        """Replace the selection (unknown uuids are dropped); returns the changed item indexes."""
+        new = {uid for uid in uuids if uid in self._position}
+        changed = [i for uid in new.symmetric_difference(self.selected) for i in self._items_by_uuid[uid]]
+        self.selected = new
+        return changed
+
+    def selected_uuids(self) -> List[str]:
+        """Selected uuids in item order."""
+        return sorted(self.selected, key=self._position.__getitem__)
+
+
+class VirtualListbox(ttk.Frame):
+    """
+    Scrollable list over labels[rows]; only the visible window is inserted
+    into the underlying Listbox.
+
+    on_click(item) is called with the clicked item's index into labels;
+    is_selected(item) decides which visible rows are drawn selected.
+    """
+
+    def __init__(self, parent, labels: Sequence[str], height: int = 10,
+                 on_click: Optional[Callable[[int], None]] = None,
+                 is_selected: Optional[Callable[[int], bool]] = None):
+        super().__init__(parent)
+        self.labels = labels
+        self.rows: Sequence[int] = range(len(labels))
+        self.top = 0
+        self._line_of: Dict[int, int] = {}  # item -> line, for the rows in view
+        self.on_click = on_click
+        self.is_selected = is_selected or (lambda item: False)
+
+        self.listbox = tk.Listbox(self, height=height, selectmode=tk.MULTIPLE,
+                                  exportselection=False, activestyle="none")
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self._visible = height
+        self._linespace = tkfont.Font(font=self.listbox.cget("font")).metrics("linespace")
+
+        self.listbox.bind("<Configure>", self._on_resize)
+        self.listbox.bind("<ButtonRelease-1>", self._on_release)
+        self.listbox.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1))
+        self.listbox.bind("<Button-4>", lambda e: self.scroll(-1))
+        self.listbox.bind("<Button-5>", lambda e: self.scroll(1))
+        # The window is redrawn by us; stop the Listbox scrolling itself
+        for seq in ("<B1-Motion>", "<Up>", "<Down>", "<Prior>", "<Next>"):
+            self.listbox.bind(seq, lambda e: "break")
+
+    def set_rows(self, rows: Sequence[int]):
+        """Show only these item indexes (e.g. a search result), from the top."""
+        self.rows = rows
+        self.top = 0
+        self.render()
+
+    def item_at(self, line: int) -> Optional[int]:
+        pos = self.top + line
+        return self.rows[pos] if 0 <= line < self._visible and pos < len(self.rows) else None
+
+    def render(self):
+        window = self.rows[self.top:self.top + self._visible]
+        self._line_of = {item: line for line, item in enumerate(window)}
+        lb = self.listbox
+        lb.delete(0, tk.END)
+        if window:
+            lb.insert(tk.END, *(self.labels[i] for i in window))
+            for line, item in enumerate(window):
+                if self.is_selected(item):
+                    lb.selection_set(line)
+        self._update_scrollbar()
+
+    def update_items(self, items: Iterable[int]):
+        """Redraw the selection state of just these items (those out of view are skipped)."""
+        for item in items:
+            line = self._line_of.get(item)
+            if line is None:
+                continue
+            if self.is_selected(item):
+                self.listbox.selection_set(line)
+            else:
+                self.listbox.selection_clear(line)
+
+    def scroll(self, lines: int):
+        top = max(0, min(self.top + lines, len(self.rows) - self._visible))
+        if top != self.top:
+            self.top = top
+            self.render()
+        return "break"
+
+    def _update_scrollbar(self):
+        n = len(self.rows)
+        if n <= self._visible:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.top / n, (self.top + self._visible) / n)
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll(int(float(amount) * len(self.rows)) - self.top)
+        elif action == "scroll":
+            step = self._visible if unit == "pages" else 1
+            self.scroll(int(amount) * step)
+
+    def _on_resize(self, event):
+        visible = max(1, event.height // max(1, self._linespace))
+        if visible != self._visible:
+            self._visible = visible
+            self.top = max(0, min(self.top, len(self.rows) - visible))
+            self.render()
+
+    def _on_release(self, event):
+        item = self.item_at(self.listbox.nearest(event.y))
+        if item is not None and self.on_click is not None:
+            self.on_click(item)
@@ -0,0 +1,209 @@
+"""
+tex_export.py
+
+Renders the catalog into the \\unitcard / \\weapontable blocks that
+pdfmaker.tex pulls in through units.tex.
+
+Cards are produced by generators and streamed straight to the output
+(a file, stdout, or a pipe into LaTeX), so the whole document is never held
+in memory. Two modes:
+- full: render every card and write units.tex
+- incremental: keep rendered cards in memory (CardCache) and re-render only
+  the ones the editor flagged as changed; across sessions, fragments are
+  cached on disk keyed by a hash of each unit's resolved card (unit row +
+  weapons, keywords and tags), so only cards whose hash is new get rendered.
+"""
+
+import hashlib
+import json
+import os
+import sys
+from contextlib import contextmanager
+from typing import Dict, Iterator, Set, TextIO, Tuple, Union
+
+from catalog import Catalog
+
+CACHE_DIR = ".tex_cache"
+MANIFEST_FILE = "manifest.json"
+WRITE_BUFFER = 1 << 16
+
+# Bump when render_card's output changes so cached fragments are discarded
+FORMAT_VERSION = 1
+
+
+def iter_card(catalog: Catalog, unit: Dict[str, str]) -> Iterator[str]:
+    """Yield the \\unitcard and \\weapontable block of one unit piece by piece."""
+    tags_str = ', '.join(catalog.unit_tag_names(unit))
+    yield "\\unitcard{" + unit.get('name','') + "}{" + unit.get('subtitle','') + "}{" + unit.get('M','-') + "}{" + unit.get('A','-') + "}{" + unit.get('C','-') + "}{" + unit.get('H','-') + "}{" + unit.get('MP','-') + "}{" + unit.get('Mat','-') + "}{" + tags_str + "}\n"
+
+    # Abilities injection: use 'None' when empty; convert newlines to LaTeX line breaks
+    abilities_raw = unit.get('abilities', '') or ''
+    abilities_text = abilities_raw.strip()
+    if not abilities_text:
+        abilities_text = 'None'
+    else:
+        abilities_text = abilities_text.replace('\n', ' \\\\ ')
+
+    yield "\\weapontable{"
+    for w in catalog.unit_weapons(unit):
+        keywords_str = ', '.join(catalog.weapon_keyword_names(w))
+        yield f"{w.get('name','')} & {w.get('R','-')} & {w.get('N','-')} & {w.get('L','-')} & {w.get('M','-')} & {w.get('H','-')} & {w.get('F','-')} & {keywords_str} \\\\ \\hline\n"
+    yield "}{" + abilities_text + "}\n\n"
+
+
+def render_card(catalog: Catalog, unit: Dict[str, str]) -> str:
+    return ''.join(iter_card(catalog, unit))
+
+
+def iter_units_tex(catalog: Catalog) -> Iterator[str]:
+    for unit in catalog.units:
+        yield from iter_card(catalog, unit)
+
+
+@contextmanager
+def open_output(out: Union[str, TextIO]):
+    """
+    Resolve an export target: a path, "-" for stdout, or an already open
+    text stream (e.g. the stdin of a LaTeX process), which is left open.
+    """
+    if out == "-":
+        yield sys.stdout
+        sys.stdout.flush()
+    elif isinstance(out, str):
+        with open(out, 'w', encoding='utf-8', buffering=WRITE_BUFFER) as f:
+            yield f
+    else:
+        yield out
+        out.flush()
+
+
+def card_hash(catalog: Catalog, unit: Dict[str, str]) -> str:
+    """Content hash of everything render_card reads for this unit."""
+    resolved = {
+        "format": FORMAT_VERSION,
+        "unit": unit,
+        "weapons": [[w, catalog.weapon_keyword_names(w)] for w in catalog.unit_weapons(unit)],
+        "tags": catalog.unit_tag_names(unit),
+    }
+    payload = json.dumps(resolved, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def write_units_tex(catalog: Catalog, out: TextIO):
+    """Stream every card to an open text stream without building the document in memory."""
+    write = out.write
+    for chunk in iter_units_tex(catalog):
+        write(chunk)
+
+
+def export_units_tex(catalog: Catalog, out: Union[str, TextIO] = "units.tex"):
+    with open_output(out) as f:
+        write_units_tex(catalog, f)
+
+
+def _write_atomic(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class CardCache:
+    """
+    Rendered cards kept in memory between exports, by unit uuid.
+
+    Whoever edits the catalog flags what changed with mark_unit() /
+    mark_weapon(); export() then renders only those cards and writes every
+    other one from memory, so no unchanged card is hashed or read back.
+    The first export of a session has nothing in memory yet: it hashes each
+    card once and picks up the fragments cached in cache_dir by earlier runs.
+    Rendered fragments are always written to cache_dir for the next session.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.fragments: Dict[str, str] = {}
+        self.hashes: Dict[str, str] = {}
+        self.dirty: Set[str] = set()
+        self.primed = False
+
+    def mark_unit(self, unit_uuid: str):
+        self.dirty.add(unit_uuid)
+
+    def mark_weapon(self, catalog: Catalog, weapon_uuid: str):
+        """A weapon's row is on the card of every unit carrying it."""
+        self.dirty.update(catalog.units_by_weapon.get(weapon_uuid, ()))
+
+    def _fragment_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".tex")
+
+    def _read_manifest(self) -> Dict[str, str]:
+        try:
+            with open(os.path.join(self.cache_dir, MANIFEST_FILE), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        return manifest if isinstance(manifest, dict) else {}
+
+    def _load(self, catalog: Catalog, unit: Dict[str, str]) -> Tuple[str, str, bool]:
+        """(hash, card, rendered) for a card not in memory, from the disk cache if it has it."""
+        key = card_hash(catalog, unit)
+        try:
+            with open(self._fragment_path(key), encoding="utf-8", newline="") as f:
+                return key, f.read(), False
+        except FileNotFoundError:
+            card = render_card(catalog, unit)
+            _write_atomic(self._fragment_path(key), card)
+            return key, card, True
+
+    def export(self, catalog: Catalog, out: Union[str, TextIO] = "units.tex") -> Tuple[int, int]:
+        """Write units.tex, rendering only flagged or unseen cards. Returns (rendered, reused)."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        previous = dict(self.hashes) if self.primed else self._read_manifest()
+
+        rendered = reused = 0
+        fragments: Dict[str, str] = {}
+        hashes: Dict[str, str] = {}
+        with open_output(out) as dest:
+            for unit in catalog.units:
+                uid = unit["uuid"]
+                card = None if uid in self.dirty or uid in fragments else self.fragments.get(uid)
+                if card is None:
+                    key, card, fresh = self._load(catalog, unit)
+                    if fresh:
+                        rendered += 1
+                    else:
+                        reused += 1
+                    # A duplicated uuid keeps its first card in memory; the copy is reloaded each time
+                    if uid not in fragments:
+                        fragments[uid], hashes[uid] = card, key
+                else:
+                    fragments[uid], hashes[uid] = card, self.hashes[uid]
+                    reused += 1
+                dest.write(card)
+
+        # Drop fragments of cards that no longer exist
+        current = set(hashes.values())
+        for key in set(previous.values()) - current:
+            try:
+                os.remove(self._fragment_path(key))
+            except FileNotFoundError:
+                pass
+        if hashes != previous:
+            _write_atomic(os.path.join(self.cache_dir, MANIFEST_FILE), json.dumps(hashes, sort_keys=True))
+
+        self.fragments, self.hashes = fragments, hashes
+        self.dirty.clear()
+        self.primed = True
+        return rendered, reused
+
+
+def export_units_tex_incremental(catalog: Catalog, out: Union[str, TextIO] = "units.tex",
+                                 cache_dir: str = CACHE_DIR) -> Tuple[int, int]:
+    """
+    One-off incremental export (e.g. from the command line): cards whose
+    content hash is cached in cache_dir are reused, the rest are rendered.
+
+    Returns (rendered, reused) card counts.
+    """
+    return CardCache(cache_dir).export(catalog, out)
@@ -0,0 +1,202 @@
+"""
+arcs.py
+
+Firing arcs on the hex board (hexmap): the Frontal keyword and Overwatch.
+
+The front arc of a unit facing f is the tile directly ahead plus every tile
+at least partially inside the 60 degree cone extending from its front edge
+(RuleBook/KeyWords.md). The cone's sides continue the lines from the tile
+center through the ends of that edge, so the cone is the +-30 degree wedge
+around f seen from the center. Whether a tile overlaps it only depends on
+the offset between the tiles, so the geometry is done once around the
+board center and shifted to every tile:
+
+    ARCS[t][f][r]: bitset of the tiles in the arc of t facing f within range r
+
+Overwatch (Game Rules.md, Special) watches one such arc; a watcher fires
+when an enemy enters its range within the arc. Overwatch keeps every active
+watcher's mask and checks a movement path against them with bit operations.
+"""
+
+import math
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import hexmap
+from hexmap import COORDS, DIRECTIONS, DISKS, FACINGS, INDEX, MAX_DISTANCE, TILES
+
+_SQRT3 = math.sqrt(3.0)
+# Overlaps thinner than this (tiles the cone only touches) do not count
+_EPS = 1e-9
+
+
+def _pixel(q: float, r: float) -> Tuple[float, float]:
+    # Pointy-top hexes of circumradius 1
+    return _SQRT3 * (q + r / 2.0), 1.5 * r
+
+
+def _hexagon(q: int, r: int) -> List[Tuple[float, float]]:
+    cx, cy = _pixel(q, r)
+    return [(cx + math.cos(math.radians(30 + 60 * i)), cy + math.sin(math.radians(30 + 60 * i))) for i in range(6)]
+
+
+def _cone(facing: int, length: float) -> List[Tuple[float, float]]:
+    """The wedge around facing, cut off at length."""
+    fx, fy = _pixel(*DIRECTIONS[facing])
+    angle = math.atan2(fy, fx)
+    return [(0.0, 0.0)] + [(length * math.cos(angle + da), length * math.sin(angle + da))
+                           for da in (math.radians(-30), math.radians(30))]
+
+
+def _overlap(a: List[Tuple[float, float]], b: List[Tuple[float, float]]) -> bool:
+    """Whether two convex polygons share some area (separating axis test)."""
+    for poly in (a, b):
+        for i in range(len(poly)):
+            (x1, y1), (x2, y2) = poly[i], poly[(i + 1) % len(poly)]
+            nx, ny = y1 - y2, x2 - x1
+            pa = [nx * x + ny * y for x, y in a]
+            pb = [nx * x + ny * y for x, y in b]
+            if min(pa) >= max(pb) - _EPS or min(pb) >= max(pa) - _EPS:
+                return False
+    return True
+
+
+def _build_offsets() -> List[List[Tuple[int, int]]]:
+    """Per facing, the axial offsets (other than 0, 0) inside the cone."""
+    reach = MAX_DISTANCE
+    length = 2.0 * reach + 2.0
+    offsets = []
+    for f in range(FACINGS):
+        cone = _cone(f, length)
+        offsets.append([(dq, dr) for dq in range(-reach, reach + 1) for dr in range(-reach, reach + 1)
+                        if 0 < max(abs(dq), abs(dr), abs(dq + dr)) <= reach and _overlap(cone, _hexagon(dq, dr))])
+    return offsets
+
+
+def _build_arcs() -> List[List[List[int]]]:
+    offsets = _build_offsets()
+    arcs = []
+    for q, r in COORDS:
+        t = INDEX[(q, r)]
+        per_facing = []
+        for f in range(FACINGS):
+            cone = hexmap.mask_of(INDEX[(q + dq, r + dr)] for dq, dr in offsets[f] if (q + dq, r + dr) in INDEX)
+            per_facing.append([cone & DISKS[t][d] for d in range(MAX_DISTANCE + 1)])
+        arcs.append(per_facing)
+    return arcs
+
+
+ARCS: List[List[List[int]]] = _build_arcs()
+
+
+def arc_mask(tile: int, facing: int, weapon_range: int = MAX_DISTANCE) -> int:
+    """Tiles in the front arc of tile facing this way, within weapon_range."""
+    return ARCS[tile][facing % FACINGS][min(max(weapon_range, 0), MAX_DISTANCE)]
+
+
+def in_arc(tile: int, facing: int, target: int) -> bool:
+    return (ARCS[tile][facing % FACINGS][MAX_DISTANCE] >> target) & 1 == 1
+
+
+def frontal_targets(tile: int, facing: int, weapon_range: int, candidates: int, visible: Optional[int] = None) -> int:
+    """
+    Tiles of candidates a Frontal weapon can target; visible is the shooter's
+    LoS bitset (los.LineOfSight.visible[tile]), if LoS matters.
+    """
+    mask = arc_mask(tile, facing, weapon_range) & candidates
+    return mask & visible if visible is not None else mask
+
+
+# Overwatch
+
+class Watcher(NamedTuple):
+    unit: str
+    player: int
+    tile: int
+    direction: int
+    weapon_range: int
+    mask: int
+
+
+class Interrupt(NamedTuple):
+    step: int       # index in the path of the step that triggered it
+    tile: int
+    watchers: List[str]
+
+
+class Overwatch:
+    """
+    Active Overwatch watchers, by unit.
+
+    threat[p] is the union of the masks watching units of player p, so a
+    path that never touches it is cleared with one AND per step.
+    """
+
+    def __init__(self, players: int = 2):
+        self.watchers: Dict[str, Watcher] = {}
+        self.threat: List[int] = [0] * players
+
+    def _rebuild(self, player: int):
+        mask = 0
+        for w in self.watchers.values():
+            if w.player != player:
+                mask |= w.mask
+        self.threat[player] = mask
+
+    def _rebuild_all(self):
+        for p in range(len(self.threat)):
+            self._rebuild(p)
+
+    def watch(self, unit: str, player: int, tile: int, direction: int, weapon_range: int) -> Watcher:
+        """unit (owned by player) watches the arc towards direction."""
+        watcher = Watcher(unit, player, tile, direction % FACINGS, weapon_range,
+                          arc_mask(tile, direction, weapon_range))
+        self.watchers[unit] = watcher
+        self._rebuild_all()
+        return watcher
+
+    def release(self, unit: str):
+        """unit stops watching (it fired, moved or lost Focus)."""
+        if self.watchers.pop(unit, None) is not None:
+            self._rebuild_all()
+
+    def check_path(self, player: int, tiles: Sequence[int], visible: Optional[Sequence[int]] = None) -> Optional[Interrupt]:
+        """
+        First step of a move by a unit of player that enters an enemy
+        watcher's arc, or None. tiles is the path including the start tile
+        (a unit already inside an arc does not trigger it until it leaves and
+        comes back). visible, if given, is los.LineOfSight.visible: watchers
+        without LoS to the tile do not fire.
+        """
+        threat = self.threat[player]
+        if not any((threat >> t) & 1 for t in tiles[1:]):
+            return None
+        for step in range(1, len(tiles)):
+            here, before = tiles[step], tiles[step - 1]
+            if not (threat >> here) & 1:
+                continue
+            fired = [w.unit for w in self.watchers.values()
+                     if w.player != player and (w.mask >> here) & 1 and not (w.mask >> before) & 1
+                     and (visible is None or (visible[w.tile] >> here) & 1)]
+            if fired:
+                return Interrupt(step, here, fired)
+        return None
+
+    def check_states(self, player: int, states: Iterable[int], visible: Optional[Sequence[int]] = None) -> Optional[Interrupt]:
+        """
+        check_path() for a movement.Reach path of (tile * 6 + facing) states;
+        turns in place are dropped, so step counts tiles entered.
+        """
+        tiles: List[int] = []
+        for s in states:
+            t = s // FACINGS
+            if not tiles or tiles[-1] != t:
+                tiles.append(t)
+        return self.check_path(player, tiles, visible)
+
+
+if __name__ == "__main__":
+    center = hexmap.CENTER
+    for f in range(FACINGS):
+        print(f"facing {f}: {hexmap.count(arc_mask(center, f, 3)):2} tiles within 3: "
+              f"{hexmap.describe(arc_mask(center, f, 2))}")
+    print(f"{TILES * FACINGS * (MAX_DISTANCE + 1)} arc masks")
@@ -0,0 +1,151 @@
+"""
+bench_actions.py
+
+Benchmark for playtest_db.actions_for_session on synthetic sessions.
+
+Builds a throwaway database with one session per size (default 10, 100,
+1000 and 10000 actions, each with 1-3 participants and 0-3 tags), checks
+that actions_for_session returns what the baseline per-action queries
+returned (tags compared as sets: the baseline left their order to SQLite,
+actions_for_session sorts them by tag id), and times both.
+
+actions_for_session issues two queries whatever the session's size, but
+it still reads and groups every row, so its latency grows linearly with
+the number of actions (about 10 us per action here, ~100 ms at 10^4). What
+stays flat is the time per action; the N+1 version also grows linearly,
+only with a larger constant (a round trip per participant and tag lookup),
+so the gain is a constant factor of about 2-3x, not a better complexity.
+
+Usage: python bench_actions.py [--sizes 10 100 1000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import playtest_db
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+TAGS = ["move", "critical", "hit", "miss", "kill", "uncommon", "objective"]
+
+
+def actions_for_session_per_action(conn: sqlite3.Connection, session_id: int) -> List[Dict[str, Any]]:
+    # The baseline implementation, verbatim (two extra queries per action)
+    cur = conn.cursor()
+    cur.execute("""
+    SELECT a.id, p.name as player_name, a.type, a.notes
+    FROM Actions a
+    LEFT JOIN Players p ON p.id = a.player_id
+    WHERE a.session_id = ?
+    ORDER BY a.id ASC
+    """, (session_id,))
+    rows = cur.fetchall()
+    actions = []
+    for r in rows:
+        aid = r[0]
+        # Get participants
+        cur.execute("""
+            SELECT is_primary, name_text 
+            FROM ActionParticipants 
+            WHERE action_id = ?
+            ORDER BY is_primary DESC, id ASC
+        """, (aid,))
+        participants = cur.fetchall()
+        
+        # Split into primary and secondary
+        primary = next((p[1] for p in participants if p[0]), None)
+        secondary = [p[1] for p in participants if not p[0]]
+        
+        # Get tags
+        cur.execute("""
+            SELECT t.name 
+            FROM Tags t 
+            JOIN ActionTags at ON t.id = at.tag_id 
+            WHERE at.action_id = ?
+        """, (aid,))
+        tags = [t[0] for t in cur.fetchall()]
+        
+        actions.append({
+            "id": aid,
+            "player": r[1],
+            "type": r[2],
+            "notes": r[3],
+            "primary_participant": primary,
+            "secondary_participants": secondary,
+            "tags": tags
+        })
+    return actions
+
+
+def _tag_sets(actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # The reference's tag query has no ORDER BY, so its tag order is whatever SQLite returns
+    return [dict(a, tags=sorted(a["tags"])) for a in actions]
+
+
+def seed_session(conn: sqlite3.Connection, n_actions: int, rng: random.Random) -> int:
+    session_id = playtest_db.add_session(conn, "bench", "Alice", "Bob", notes=f"{n_actions} actions")
+    actions = []
+    for i in range(n_actions):
+        actions.append({
+            "player_name": rng.choice(["Alice", "Bob"]),
+            "type": rng.choice(["Advance", "Salvo", "Capture", "Move", "Shot"]),
+            "notes": f"action {i}",
+            "primary_participant": f"Unit {rng.randint(1, 20)}",
+            "secondary_participants": [f"Tile {rng.randint(1, 169)}" for _ in range(rng.randint(0, 2))],
+            "tags": rng.sample(TAGS, rng.randint(0, 3)),
+        })
+    playtest_db.add_actions_bulk(conn, session_id, actions)
+    return session_id
+
+
+def _best_time(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmark(sizes: List[int], repeat: int = 5, seed: int = 0) -> List[Dict[str, float]]:
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = playtest_db.connect(os.path.join(tmp, "bench.sqlite3"))
+        playtest_db.init_db(conn)
+        sessions = {n: seed_session(conn, n, rng) for n in sizes}
+        # Other sessions' rows, so lookups cannot just scan a tiny table
+        seed_session(conn, max(sizes), rng)
+
+        results = []
+        for n, session_id in sessions.items():
+            expected = _tag_sets(actions_for_session_per_action(conn, session_id))
+            if _tag_sets(playtest_db.actions_for_session(conn, session_id)) != expected:
+                raise AssertionError(f"actions_for_session differs from the reference for {n} actions")
+            new = _best_time(lambda: playtest_db.actions_for_session(conn, session_id), repeat)
+            # The reference takes seconds on large sessions; once is enough there
+            old = _best_time(lambda: actions_for_session_per_action(conn, session_id), repeat if n <= 1000 else 1)
+            results.append({"actions": n, "set_based_s": new, "per_action_s": old})
+        conn.close()
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark actions_for_session against the per-action queries")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{'actions':>8} {'set-based':>12} {'per action':>12} {'us/action':>10} {'speedup':>8}")
+    for r in run_benchmark(args.sizes, args.repeat, args.seed):
+        n = r["actions"]
+        print(f"{n:>8} {r['set_based_s'] * 1e3:>10.2f}ms {r['per_action_s'] * 1e3:>10.2f}ms "
+              f"{r['set_based_s'] / n * 1e6:>10.2f} {r['per_action_s'] / r['set_based_s']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
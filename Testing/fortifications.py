@@ -0,0 +1,220 @@
+"""
+fortifications.py
+
+Fortification Damage and Fortification Health Checks (RuleBook/Game
+Rules.md, "Fortifications"), resolved exactly or in NumPy batches.
+
+A building is its pip counts per color, (neutral, player 0, player 1); its
+health is the total. Damage F removes F pips one at a time, always from the
+most popular color, ties going neutral > enemy > ally (relative to the
+attacker). For each pip removed, every enemy unit inside rolls a d12 and
+loses 1 H on a 9+.
+
+Afterwards, while the units inside have more total H than the building has
+pips, they make attacks in order of H (lowest first, units allied to the
+attacker first on ties), one per unit per round. The rules do not say what
+an attack hits; here each one costs the unit making it 1 H, and units at 0 H
+are removed.
+
+resolve() returns every outcome with its exact probability (Fractions);
+simulate() runs thousands of bombardments at once, for tuning weapons' F
+against real garrisons.
+
+Usage: python fortifications.py --pips 0 4 2 --damage 3 --garrison 1:2 1:4 [--trials N]
+"""
+
+import argparse
+from fractions import Fraction
+from math import comb
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+DIE = 12
+HIT_ROLL = 9
+NEUTRAL = 0
+COLORS = 3
+HIT = Fraction(DIE - HIT_ROLL + 1, DIE)
+
+Pips = Tuple[int, int, int]
+
+
+class Occupant(NamedTuple):
+    unit: str
+    player: int
+    health: int
+
+
+class Outcome(NamedTuple):
+    probability: Fraction
+    pips: Pips
+    health: Tuple[int, ...]     # per occupant, in the order given
+
+
+def color_of(player: int) -> int:
+    return 1 + player
+
+
+def _priority(attacker: int) -> Tuple[int, int, int]:
+    # Tie order per color index: neutral first, then the attacker's enemy, then its ally
+    order = [0] * COLORS
+    order[NEUTRAL] = 2
+    order[color_of(1 - attacker)] = 1
+    order[color_of(attacker)] = 0
+    return tuple(order)
+
+
+def remove_pips(pips: Sequence[int], damage: int, attacker: int) -> Tuple[Pips, int]:
+    """Pips left after damage, and how many were removed."""
+    left = list(pips)
+    priority = _priority(attacker)
+    removed = 0
+    while removed < damage and any(left):
+        color = max(range(COLORS), key=lambda c: (left[c], priority[c]))
+        left[color] -= 1
+        removed += 1
+    return tuple(left), removed
+
+
+def _check_order(occupants: Sequence[Occupant], health: Sequence[int], attacker: int) -> List[int]:
+    return sorted(range(len(occupants)), key=lambda i: (health[i], occupants[i].player != attacker, i))
+
+
+def health_check(pips: int, occupants: Sequence[Occupant], health: Sequence[int], attacker: int) -> Tuple[int, ...]:
+    """Occupants' H after the building's health check (pips is the building's health)."""
+    health = list(health)
+    excess = sum(health) - pips
+    if excess <= 0:
+        return tuple(health)
+    order = _check_order(occupants, health, attacker)
+    while excess > 0:
+        for i in order:
+            if excess <= 0:
+                break
+            if health[i] > 0:
+                health[i] -= 1
+                excess -= 1
+    return tuple(health)
+
+
+def _damage_distribution(pips_removed: int, health: int) -> List[Tuple[int, Fraction]]:
+    """(H lost, probability) for one unit under pips_removed rolls, capped at its H."""
+    dist: Dict[int, Fraction] = {}
+    for hits in range(pips_removed + 1):
+        p = comb(pips_removed, hits) * HIT ** hits * (1 - HIT) ** (pips_removed - hits)
+        lost = min(hits, health)
+        dist[lost] = dist.get(lost, Fraction(0)) + p
+    return sorted(dist.items())
+
+
+def resolve(pips: Sequence[int], damage: int, attacker: int, occupants: Sequence[Occupant] = ()) -> List[Outcome]:
+    """Every outcome of one attack with this fortification damage, most likely first."""
+    left, removed = remove_pips(pips, damage, attacker)
+    total = sum(left)
+    # Only enemies of the attacker roll for removed pips
+    per_unit = [_damage_distribution(removed, o.health) if o.player != attacker else [(0, Fraction(1))]
+                for o in occupants]
+
+    outcomes: Dict[Tuple[int, ...], Fraction] = {}
+    partial: List[Tuple[Tuple[int, ...], Fraction]] = [((), Fraction(1))]
+    for o, dist in zip(occupants, per_unit):
+        partial = [(h + (o.health - lost,), p * q) for h, p in partial for lost, q in dist]
+    for health, p in partial:
+        final = health_check(total, occupants, health, attacker)
+        outcomes[final] = outcomes.get(final, Fraction(0)) + p
+    return sorted((Outcome(p, left, h) for h, p in outcomes.items()), key=lambda o: -o.probability)
+
+
+def expected_health(outcomes: Sequence[Outcome]) -> List[float]:
+    """Expected H left per occupant."""
+    if not outcomes:
+        return []
+    return [float(sum(o.probability * o.health[i] for o in outcomes)) for i in range(len(outcomes[0].health))]
+
+
+# Batched
+
+def _remove_batch(pips: np.ndarray, damage: np.ndarray, attacker: int) -> np.ndarray:
+    """remove_pips() on (n, 3) pip counts in place; returns pips removed per row."""
+    key_bias = np.array(_priority(attacker))
+    removed = np.zeros(len(pips), dtype=np.int64)
+    rows = np.arange(len(pips))
+    for _ in range(int(damage.max(initial=0))):
+        active = (removed < damage) & (pips.sum(axis=1) > 0)
+        if not active.any():
+            break
+        color = np.argmax(pips * COLORS + key_bias, axis=1)
+        pips[rows[active], color[active]] -= 1
+        removed += active
+    return removed
+
+
+def simulate(pips: Sequence[int], damage, attacker: int, occupants: Sequence[Occupant] = (), trials: int = 10000,
+             seed=None) -> Dict[str, np.ndarray]:
+    """
+    trials independent attacks on copies of one building. damage is an int or
+    a (trials,) array (e.g. one F per weapon being compared). Returns:
+    - pips:   (trials, 3) pips left
+    - health: (trials, occupants) H left
+    """
+    rng = np.random.default_rng(seed)
+    board = np.tile(np.asarray(pips, dtype=np.int64), (trials, 1))
+    damage = np.broadcast_to(np.asarray(damage, dtype=np.int64), (trials,))
+    removed = _remove_batch(board, damage, attacker)
+
+    start = np.array([o.health for o in occupants], dtype=np.int64)
+    enemy = np.array([o.player != attacker for o in occupants], dtype=bool)
+    health = np.tile(start, (trials, 1))
+    if len(occupants):
+        hits = rng.binomial(removed[:, None], float(HIT), size=health.shape)
+        health = np.maximum(health - hits * enemy, 0)
+
+        # Health checks: order by current H, then allies of the attacker, then position
+        position = np.broadcast_to(np.arange(len(occupants)), health.shape)
+        order = np.lexsort((position, np.broadcast_to(enemy, health.shape), health), axis=1)
+        excess = health.sum(axis=1) - board.sum(axis=1)
+        rows = np.arange(trials)
+        while (excess > 0).any():
+            for k in range(len(occupants)):
+                unit = order[:, k]
+                hit = (excess > 0) & (health[rows, unit] > 0)
+                health[rows[hit], unit[hit]] -= 1
+                excess -= hit
+    return {"pips": board, "health": health}
+
+
+def _parse_occupant(i: int, text: str) -> Occupant:
+    try:
+        player, health = (int(x) for x in text.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected player:H, got {text!r}") from None
+    return Occupant(f"unit{i}", player, health)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resolve fortification damage and health checks")
+    parser.add_argument("--pips", type=int, nargs=3, required=True, metavar=("NEUTRAL", "P0", "P1"))
+    parser.add_argument("--damage", type=int, required=True, help="the weapon's F")
+    parser.add_argument("--attacker", type=int, default=0, choices=(0, 1))
+    parser.add_argument("--garrison", nargs="*", default=[], help="units inside, as player:H")
+    parser.add_argument("--trials", type=int, help="simulate this many attacks instead of resolving exactly")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    occupants = [_parse_occupant(i, text) for i, text in enumerate(args.garrison)]
+    if args.trials:
+        result = simulate(args.pips, args.damage, args.attacker, occupants, args.trials, args.seed)
+        print(f"{args.trials} attacks: pips left {result['pips'].mean(axis=0).round(3).tolist()}")
+        for i, o in enumerate(occupants):
+            print(f"  {o.unit} (player {o.player}): mean H left {result['health'][:, i].mean():.3f}, "
+                  f"destroyed {np.mean(result['health'][:, i] == 0):.1%}")
+        return
+    outcomes = resolve(args.pips, args.damage, args.attacker, occupants)
+    print(f"Pips left: {outcomes[0].pips}")
+    for o in outcomes:
+        print(f"  {float(o.probability):.4f}  H {list(o.health)}")
+    print(f"Expected H left: {[round(h, 3) for h in expected_health(outcomes)]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+"""
+game_state.py
+
+Live game state: units, buildings and the turn's action budget, kept in flat
+arrays so a search or replay can apply and undo millions of actions without
+copying dicts.
+
+Unit i is a column across the unit arrays (health[i], tile[i], facing[i],
+...); building b owns pips[3 * b:3 * b + 3] as (neutral, player 0, player 1)
+(see fortifications). Every change goes through _set(), which records the
+old value on a trail; apply() marks the trail and undo() rolls back to the
+last mark, so undoing an action costs as much as the action changed.
+
+Actions are the rulebook's (interface_gui.ACTION_TYPES). The Major ones
+(Advance, Embark, Disembark, Salvo, Capture) must come before the Minor one
+(Move, Consolidate, Control, Shot) if they are used at all. Dice are not
+rolled here: a Salvo or Shot carries the H it removes, so the caller (a
+simulator, an AI or a replay) decides outcomes and the state stays
+deterministic. Movement is checked, though: an Advance must end on a state
+movement.reachable() allows within the unit's M, with enemy tiles blocked,
+and a Move or Disembark must end on a tile the unit fits in
+(movement.fits). Only infantry Embark, into a transport that is not itself
+embarked and still has room (add_unit's capacity).
+"""
+
+from array import array
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import hexmap
+import movement
+from fortifications import COLORS, NEUTRAL, color_of, remove_pips
+
+# Same list as interface_gui.ACTION_TYPES (importing the GUI would open its window)
+ACTION_TYPES = ["Advance", "Embark", "Disembark", "Salvo", "Capture", "Move", "Consolidate", "Control", "Shot"]
+MAJOR_ACTIONS = ("Advance", "Embark", "Disembark", "Salvo", "Capture")
+MINOR_ACTIONS = ("Move", "Consolidate", "Control", "Shot")
+PLAYERS = 2
+
+# Unit flags, cleared at the end of each turn
+MOVED, SHOT, CAPTURED = 1, 2, 4
+# Ammunition of units that do not track it
+UNLIMITED = -1
+NOWHERE = -1
+# Units a Transport carries (the rulebook gives no number yet)
+TRANSPORT_CAPACITY = 2
+
+
+class IllegalAction(ValueError):
+    pass
+
+
+class Action(NamedTuple):
+    type: str
+    unit: int
+    tile: int = NOWHERE             # destination (Advance, Disembark, Move)
+    facing: int = -1                # facing after moving (-1: unchanged)
+    target: int = -1                # unit shot at, transport embarked into, or building captured
+    damage: int = 0                 # H removed (Salvo, Shot)
+    units: Tuple[int, ...] = ()     # units pulled in (Consolidate)
+
+
+class GameState:
+    __slots__ = ("names", "player", "max_health", "movement", "control", "armor", "kinds", "capacity",
+                 "health", "tile", "facing", "ammo", "carrier", "flags",
+                 "building_tile", "pips",
+                 "active", "turn", "major", "minor", "_trail", "_marks")
+
+    def __init__(self):
+        # Static unit data
+        self.names: List[str] = []
+        self.player = array("b")
+        self.max_health = array("b")
+        self.movement = array("b")
+        self.control = array("b")
+        self.armor: List[str] = []
+        self.kinds: List[str] = []      # movement class (movement.movement_class)
+        self.capacity = array("b")      # units it can carry (0: not a transport)
+        # Dynamic unit data
+        self.health = array("b")
+        self.tile = array("h")
+        self.facing = array("b")
+        self.ammo = array("h")
+        self.carrier = array("h")       # transport the unit is embarked in, or -1
+        self.flags = array("B")
+        # Buildings
+        self.building_tile = array("h")
+        self.pips = array("h")
+        # Turn
+        self.active = array("b", [0])
+        self.turn = array("h", [1])
+        self.major = array("b", [1, 1])
+        self.minor = array("b", [1, 1])
+        self._trail: List[Tuple[array, int, int]] = []
+        self._marks: List[int] = []
+
+    # Setup
+
+    def add_unit(self, unit: Dict[str, str], player: int, tile: int, facing: int = 0, ammo: int = UNLIMITED,
+                 capacity: int = 0) -> int:
+        """Deploy a units.csv row (capacity: units it carries, if a Transport); returns its index."""
+        health = int(unit.get("H") or 0)
+        self.names.append(unit.get("uuid") or unit.get("name", ""))
+        self.player.append(player)
+        self.max_health.append(health)
+        self.movement.append(int(unit.get("M") or 0))
+        self.control.append(int(unit.get("C") or 0))
+        self.armor.append(unit.get("A") or "N")
+        self.kinds.append(movement.movement_class(unit))
+        self.capacity.append(capacity)
+        self.health.append(health)
+        self.tile.append(tile)
+        self.facing.append(facing)
+        self.ammo.append(ammo)
+        self.carrier.append(-1)
+        self.flags.append(0)
+        return len(self.names) - 1
+
+    def add_building(self, tile: int, pips: Sequence[int]) -> int:
+        """A building on tile with (neutral, player 0, player 1) pips; returns its index."""
+        self.building_tile.append(tile)
+        self.pips.extend(pips)
+        return len(self.building_tile) - 1
+
+    def copy(self) -> "GameState":
+        """An independent copy (the undo trail is not copied)."""
+        other = GameState()
+        for name in self.__slots__:
+            if name in ("_trail", "_marks"):
+                continue
+            value = getattr(self, name)
+            setattr(other, name, value[:] if isinstance(value, (array, list)) else value)
+        return other
+
+    def key(self) -> bytes:
+        """Hashable snapshot of everything that changes during play (for transposition tables)."""
+        return b"".join(a.tobytes() for a in (self.health, self.tile, self.facing, self.ammo, self.carrier,
+                                               self.flags, self.pips, self.active, self.turn, self.major, self.minor))
+
+    # Trail
+
+    def _set(self, values: array, i: int, value: int):
+        old = values[i]
+        if old != value:
+            self._trail.append((values, i, old))
+            values[i] = value
+
+    def undo(self):
+        """Revert the last apply() or end_turn()."""
+        if not self._marks:
+            raise IndexError("Nothing to undo")
+        mark = self._marks.pop()
+        trail = self._trail
+        while len(trail) > mark:
+            values, i, old = trail.pop()
+            values[i] = old
+
+    # Queries
+
+    def alive(self, unit: int) -> bool:
+        return self.health[unit] > 0
+
+    def units_of(self, player: int) -> List[int]:
+        return [i for i in range(len(self.names)) if self.player[i] == player and self.health[i] > 0]
+
+    def occupied(self, player: Optional[int] = None) -> int:
+        """Bitset of tiles holding living units (of one player, or anyone's)."""
+        mask = 0
+        for i in range(len(self.names)):
+            if self.health[i] > 0 and self.carrier[i] < 0 and (player is None or self.player[i] == player):
+                mask |= 1 << self.tile[i]
+        return mask
+
+    def occupied_slots(self, player: int) -> bytes:
+        """Slot occupancy as player's units see it for movement: enemy tiles are full, friendly ones free."""
+        board = bytearray(hexmap.TILES)
+        for t in hexmap.tiles_of(self.occupied(1 - player)):
+            board[t] = movement.FULL
+        return bytes(board)
+
+    def reach(self, unit: int) -> movement.Reach:
+        """Everywhere unit can Advance to this turn (memoized in movement)."""
+        player = self.player[unit]
+        return movement.reachable(movement.state(self.tile[unit], self.facing[unit]), self.movement[unit],
+                                  self.kinds[unit], self.armor[unit], self.occupied_slots(player),
+                                  self.occupied(1 - player))
+
+    def fits(self, unit: int, tile: int, facing: int = -1) -> bool:
+        """Whether unit can stand on tile (facing -1: its current one), given the other units there."""
+        facing = self.facing[unit] if facing < 0 else facing
+        return movement.fits(self.occupied_slots(self.player[unit]), tile, self.kinds[unit], self.armor[unit], facing)
+
+    def passengers(self, transport: int) -> List[int]:
+        return [i for i in range(len(self.names)) if self.carrier[i] == transport and self.health[i] > 0]
+
+    def building_at(self, tile: int) -> int:
+        for b, t in enumerate(self.building_tile):
+            if t == tile:
+                return b
+        return -1
+
+    def building_pips(self, b: int) -> Tuple[int, ...]:
+        return tuple(self.pips[COLORS * b:COLORS * b + COLORS])
+
+    def controller(self, b: int) -> Optional[int]:
+        """Player with the most pips on building b, or None on a tie."""
+        pips = self.building_pips(b)
+        counts = [pips[color_of(p)] for p in range(PLAYERS)]
+        if counts[0] == counts[1]:
+            return None
+        return 0 if counts[0] > counts[1] else 1
+
+    # Actions
+
+    def _check_budget(self, kind: str):
+        p = self.active[0]
+        if kind in MAJOR_ACTIONS:
+            if not self.major[p]:
+                raise IllegalAction("The Major action was already spent")
+            if not self.minor[p]:
+                raise IllegalAction("The Major action must be spent before the Minor one")
+        elif kind in MINOR_ACTIONS:
+            if not self.minor[p]:
+                raise IllegalAction("The Minor action was already spent")
+        else:
+            raise IllegalAction(f"Unknown action type {kind!r}")
+
+    def _check_unit(self, unit: int):
+        if not 0 <= unit < len(self.names) or self.health[unit] <= 0:
+            raise IllegalAction(f"Unit {unit} is not in play")
+        if self.player[unit] != self.active[0]:
+            raise IllegalAction(f"Unit {self.names[unit]} belongs to the other player")
+
+    def _move(self, unit: int, tile: int, facing: int):
+        self._set(self.tile, unit, tile)
+        if facing >= 0:
+            self._set(self.facing, unit, facing % hexmap.FACINGS)
+        self._set(self.flags, unit, self.flags[unit] | MOVED)
+        # Embarked units ride along
+        for i in range(len(self.names)):
+            if self.carrier[i] == unit:
+                self._set(self.tile, i, tile)
+
+    def _check_advance(self, unit: int, tile: int, facing: int):
+        reach = self.reach(unit)
+        ok = hexmap.has(reach.tiles, tile)
+        # Infantry and hover units may end facing any way; vehicles must reach that exact facing
+        if ok and facing >= 0 and self.kinds[unit] not in (movement.INFANTRY, movement.HOVER):
+            ok = movement.state(tile, facing) in reach.cost
+        if not ok:
+            q, r = hexmap.COORDS[tile]
+            raise IllegalAction(f"{self.names[unit]} cannot Advance to {q},{r} with M {self.movement[unit]}")
+
+    def _shoot(self, unit: int, target: int, damage: int, flag_check: bool):
+        if not 0 <= target < len(self.names) or self.health[target] <= 0:
+            raise IllegalAction(f"Target {target} is not in play")
+        if self.player[target] == self.player[unit]:
+            raise IllegalAction("Cannot shoot a friendly unit")
+        if flag_check and self.flags[unit] & SHOT:
+            raise IllegalAction(f"{self.names[unit]} already shot this turn")
+        if self.ammo[unit] == 0:
+            raise IllegalAction(f"{self.names[unit]} is out of ammunition")
+        if self.ammo[unit] > 0:
+            self._set(self.ammo, unit, self.ammo[unit] - 1)
+        self._set(self.health, target, max(0, self.health[target] - damage))
+        self._set(self.flags, unit, self.flags[unit] | SHOT)
+
+    def _capture(self, unit: int, b: int, once: bool):
+        if not 0 <= b < len(self.building_tile):
+            raise IllegalAction(f"Building {b} does not exist")
+        if self.tile[unit] != self.building_tile[b]:
+            raise IllegalAction(f"{self.names[unit]} is not in building {b}")
+        if once and self.flags[unit] & CAPTURED:
+            raise IllegalAction(f"{self.names[unit]} already captured this turn")
+        mine, theirs = color_of(self.player[unit]), color_of(1 - self.player[unit])
+        base = COLORS * b
+        turns = self.control[unit]
+        # Neutral pips first; a Capture turns two of them per point of C, Control one
+        per_turn = 1 if once else 2
+        while turns > 0 and self.pips[base + NEUTRAL]:
+            moved = min(per_turn, self.pips[base + NEUTRAL])
+            self._set(self.pips, base + NEUTRAL, self.pips[base + NEUTRAL] - moved)
+            self._set(self.pips, base + mine, self.pips[base + mine] + moved)
+            turns -= 1
+        moved = min(turns, self.pips[base + theirs])
+        if moved:
+            self._set(self.pips, base + theirs, self.pips[base + theirs] - moved)
+            self._set(self.pips, base + mine, self.pips[base + mine] + moved)
+        self._set(self.flags, unit, self.flags[unit] | CAPTURED)
+
+    def apply(self, action: Action):
+        """Apply one action of the active player (IllegalAction if the rules forbid it)."""
+        kind, unit = action.type, action.unit
+        self._check_budget(kind)
+        self._check_unit(unit)
+        self._marks.append(len(self._trail))
+        try:
+            self._apply(action)
+        except BaseException:
+            # Whatever went wrong, leave no half-applied action or dangling mark behind
+            self.undo()
+            raise
+        p = self.active[0]
+        self._set(self.major if kind in MAJOR_ACTIONS else self.minor, p, 0)
+
+    def _apply(self, action: Action):
+        kind, unit = action.type, action.unit
+        if kind in ("Advance", "Move", "Disembark"):
+            if not 0 <= action.tile < hexmap.TILES:
+                raise IllegalAction(f"Tile {action.tile} is not on the board")
+            if kind == "Disembark":
+                if self.carrier[unit] < 0:
+                    raise IllegalAction(f"{self.names[unit]} is not embarked")
+                self._set(self.carrier, unit, -1)
+            if kind != "Advance" and hexmap.DISTANCE[self.tile[unit]][action.tile] > 1:
+                raise IllegalAction(f"{kind} only moves 1 tile")
+            if kind == "Move" and (self.movement[unit] <= 1 or self.flags[unit] & MOVED):
+                raise IllegalAction(f"{self.names[unit]} cannot Move (M 1 or already moved)")
+            if self.carrier[unit] >= 0:
+                raise IllegalAction(f"{self.names[unit]} is embarked")
+            if kind == "Advance":
+                self._check_advance(unit, action.tile, action.facing)
+            elif not self.fits(unit, action.tile, action.facing):
+                q, r = hexmap.COORDS[action.tile]
+                raise IllegalAction(f"{self.names[unit]} does not fit in {q},{r}")
+            self._move(unit, action.tile, action.facing)
+        elif kind == "Embark":
+            transport = action.target
+            if not 0 <= transport < len(self.names) or self.player[transport] != self.player[unit] \
+                    or self.health[transport] <= 0 or transport == unit:
+                raise IllegalAction(f"{transport} is not a friendly transport")
+            if self.capacity[transport] <= 0:
+                raise IllegalAction(f"{self.names[transport]} is not a transport")
+            if self.kinds[unit] != movement.INFANTRY:
+                raise IllegalAction(f"Only infantry can embark, not {self.names[unit]}")
+            if self.carrier[unit] >= 0:
+                raise IllegalAction(f"{self.names[unit]} is already embarked")
+            if self.carrier[transport] >= 0:
+                raise IllegalAction(f"{self.names[transport]} is embarked itself")
+            if len(self.passengers(transport)) >= self.capacity[transport]:
+                raise IllegalAction(f"{self.names[transport]} is full")
+            if hexmap.DISTANCE[self.tile[unit]][self.tile[transport]] > 1:
+                raise IllegalAction("Embarking only moves 1 tile")
+            self._move(unit, self.tile[transport], -1)
+            self._set(self.carrier, unit, transport)
+        elif kind in ("Salvo", "Shot"):
+            self._shoot(unit, action.target, action.damage, flag_check=(kind == "Shot"))
+        elif kind in ("Capture", "Control"):
+            self._capture(unit, action.target, once=(kind == "Control"))
+        elif kind == "Consolidate":
+            if len(action.units) > 2:
+                raise IllegalAction("Consolidate pulls in at most 2 units")
+            here = self.tile[unit]
+            for other in action.units:
+                if not 0 <= other < len(self.names) or other == unit:
+                    raise IllegalAction(f"Unit {other} cannot be consolidated")
+                if self.player[other] != self.player[unit] or self.health[other] <= 0 or self.carrier[other] >= 0:
+                    raise IllegalAction(f"{other} cannot be consolidated")
+                if hexmap.DISTANCE[self.tile[other]][here] > 1:
+                    raise IllegalAction(f"{self.names[other]} is more than 1 tile away")
+                self._move(other, here, -1)
+
+    def damage_building(self, b: int, damage: int, attacker: int, hits: Iterable[Tuple[int, int]] = ()):
+        """
+        Fortification Damage on building b (part of the current action, so
+        call it right after the apply() it belongs to). hits lists (unit, H
+        lost) for the units inside, as rolled by the caller.
+        """
+        base = COLORS * b
+        left, _ = remove_pips(self.building_pips(b), damage, attacker)
+        for c, value in enumerate(left):
+            self._set(self.pips, base + c, value)
+        for unit, lost in hits:
+            self._set(self.health, unit, max(0, self.health[unit] - lost))
+
+    def end_turn(self):
+        """Pass to the other player, restoring their budget and clearing unit flags."""
+        self._marks.append(len(self._trail))
+        for i in range(len(self.names)):
+            if self.flags[i]:
+                self._set(self.flags, i, 0)
+        p = self.active[0]
+        nxt = 1 - p
+        self._set(self.active, 0, nxt)
+        self._set(self.major, nxt, 1)
+        self._set(self.minor, nxt, 1)
+        if nxt == 0:
+            self._set(self.turn, 0, self.turn[0] + 1)
+
+    def legal_types(self) -> List[str]:
+        """Action types the active player may still take this turn."""
+        p = self.active[0]
+        types = list(MINOR_ACTIONS) if self.minor[p] else []
+        if self.major[p] and self.minor[p]:
+            types = list(MAJOR_ACTIONS) + types
+        return types
+
+
+if __name__ == "__main__":
+    import time
+
+    state = GameState()
+    a = state.add_unit({"uuid": "a", "M": "3", "A": "L", "C": "1", "H": "5"}, 0, hexmap.tile(0, 0))
+    b = state.add_unit({"uuid": "b", "M": "2", "A": "N", "C": "2", "H": "4"}, 1, hexmap.tile(2, 0))
+    state.add_building(hexmap.tile(1, 0), (4, 0, 0))
+    snapshot = state.key()
+    n = 100_000
+    start = time.perf_counter()
+    for _ in range(n):
+        state.apply(Action("Salvo", a, target=b, damage=1))
+        state.apply(Action("Move", a, tile=hexmap.tile(1, 0)))
+        state.undo()
+        state.undo()
+    elapsed = time.perf_counter() - start
+    assert state.key() == snapshot
+    print(f"{2 * n} actions applied and undone in {elapsed:.2f} s ({elapsed / (2 * n) * 1e6:.2f} us each)")
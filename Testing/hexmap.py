@@ -0,0 +1,227 @@
+"""
+hexmap.py
+
+The game board as precomputed tables.
+
+The map is a hexagon with 8 tiles per side (169 tiles, RuleBook "Map
+Setup"). Tiles use axial coordinates (q, r) with |q|, |r|, |q + r| <= 7 and
+are numbered 0..168 in (r, q) order; everything else works on those indexes.
+
+Built once at import:
+- NEIGHBORS[t][d]: the tile next to t in direction d (-1 off the board)
+- DISTANCE[a][b]:  hex distance (a bytes row per tile)
+- RINGS[t][d] / DISKS[t][d]: bitsets of the tiles at exactly / at most d from t
+
+Sets of tiles are Python ints used as bitsets (bit t = tile t), so board
+queries are a lookup plus an AND / OR, e.g. "targets in range" is
+DISKS[shooter][weapon_range] & enemy_mask.
+
+Directions are numbered counterclockwise from east (pointy-top hexes), so a
+facing f turns left to f + 1 and right to f - 1 (mod 6).
+"""
+
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+SIDE = 8
+RADIUS = SIDE - 1
+# Axial steps, counterclockwise from east
+DIRECTIONS: Tuple[Tuple[int, int], ...] = ((1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1))
+FACINGS = len(DIRECTIONS)
+MAX_DISTANCE = 2 * RADIUS
+
+# Deployment may go up to 3 tiles from the player's edge
+DEPLOY_DEPTH = 3
+# Long weapons have +2 range (RuleBook/KeyWords.md); matched by keyword name,
+# since keywords made in the editor get generated uuids
+LONG_KEYWORD = "Long"
+LONG_BONUS = 2
+
+
+# Bitsets
+
+def mask_of(tiles: Iterable[int]) -> int:
+    mask = 0
+    for t in tiles:
+        mask |= 1 << t
+    return mask
+
+
+def tiles_of(mask: int) -> Iterator[int]:
+    """Tile indexes of a bitset, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def count(mask: int) -> int:
+    return mask.bit_count()
+
+
+def has(mask: int, tile: int) -> bool:
+    return (mask >> tile) & 1 == 1
+
+
+def _on_board(q: int, r: int) -> bool:
+    return max(abs(q), abs(r), abs(q + r)) <= RADIUS
+
+
+COORDS: List[Tuple[int, int]] = [(q, r) for r in range(-RADIUS, RADIUS + 1)
+                                 for q in range(-RADIUS, RADIUS + 1) if _on_board(q, r)]
+INDEX: Dict[Tuple[int, int], int] = {c: i for i, c in enumerate(COORDS)}
+TILES = len(COORDS)
+ALL = (1 << TILES) - 1
+
+
+def _distance(a: Tuple[int, int], b: Tuple[int, int]) -> int:
+    dq, dr = a[0] - b[0], a[1] - b[1]
+    return max(abs(dq), abs(dr), abs(dq + dr))
+
+
+NEIGHBORS: List[Tuple[int, ...]] = [
+    tuple(INDEX.get((q + dq, r + dr), -1) for dq, dr in DIRECTIONS) for q, r in COORDS
+]
+DISTANCE: List[bytes] = [bytes(_distance(a, b) for b in COORDS) for a in COORDS]
+
+
+def _build_rings() -> List[List[int]]:
+    rings = []
+    for row in DISTANCE:
+        ring = [0] * (MAX_DISTANCE + 1)
+        for b, d in enumerate(row):
+            ring[d] |= 1 << b
+        rings.append(ring)
+    return rings
+
+
+def _build_disks(rings: List[List[int]]) -> List[List[int]]:
+    disks = []
+    for ring in rings:
+        disk, acc = [], 0
+        for mask in ring:
+            acc |= mask
+            disk.append(acc)
+        disks.append(disk)
+    return disks
+
+
+RINGS: List[List[int]] = _build_rings()
+DISKS: List[List[int]] = _build_disks(RINGS)
+NEIGHBOR_MASK: List[int] = [ring[1] for ring in RINGS]
+CENTER = INDEX[(0, 0)]
+EDGE = RINGS[CENTER][RADIUS]
+
+
+def _build_sides() -> List[int]:
+    # Side k runs from corner RADIUS * DIRECTIONS[k] towards corner k + 1
+    sides = []
+    for k, (cq, cr) in enumerate(DIRECTIONS):
+        sq, sr = DIRECTIONS[(k + 2) % FACINGS]
+        sides.append(mask_of(INDEX[(RADIUS * cq + t * sq, RADIUS * cr + t * sr)] for t in range(SIDE)))
+    return sides
+
+
+SIDES: List[int] = _build_sides()
+
+
+def _build_deploy_zones() -> List[int]:
+    zones = []
+    for side in SIDES:
+        edge = list(tiles_of(side))
+        zones.append(mask_of(t for t in range(TILES) if min(DISTANCE[t][e] for e in edge) <= DEPLOY_DEPTH))
+    return zones
+
+
+# DEPLOY_ZONES[k]: tiles within DEPLOY_DEPTH of side k (the side itself included)
+DEPLOY_ZONES: List[int] = _build_deploy_zones()
+
+
+# Queries
+
+def tile(q: int, r: int) -> int:
+    """Index of the tile at axial (q, r) (KeyError off the board)."""
+    return INDEX[(q, r)]
+
+
+def distance(a: int, b: int) -> int:
+    return DISTANCE[a][b]
+
+
+def neighbor(t: int, direction: int) -> int:
+    """Tile next to t in this direction, or -1 off the board."""
+    return NEIGHBORS[t][direction % FACINGS]
+
+
+def adjacent(a: int, b: int) -> bool:
+    return (NEIGHBOR_MASK[a] >> b) & 1 == 1
+
+
+def within(t: int, d: int) -> int:
+    """Bitset of the tiles at most d from t (t included)."""
+    return DISKS[t][min(max(d, 0), MAX_DISTANCE)]
+
+
+def ring(t: int, d: int) -> int:
+    """Bitset of the tiles exactly d from t."""
+    return RINGS[t][d] if 0 <= d <= MAX_DISTANCE else 0
+
+
+def effective_range(weapon_range: int, long: bool = False) -> int:
+    return weapon_range + (LONG_BONUS if long else 0)
+
+
+def weapon_range(weapon: Dict[str, str], keyword_names: Iterable[str]) -> int:
+    """
+    Range of a weapons.csv row, with the Long bonus if it has the keyword.
+    keyword_names are the weapon's resolved keyword names
+    (Catalog.weapon_keyword_names).
+    """
+    r = (weapon.get("R") or "").strip()
+    return effective_range(int(r) if r.isdigit() else 0, LONG_KEYWORD in keyword_names)
+
+
+def in_range(shooter: int, target: int, weapon_range: int, long: bool = False) -> bool:
+    return DISTANCE[shooter][target] <= effective_range(weapon_range, long)
+
+
+def range_mask(shooter: int, weapon_range: int, long: bool = False) -> int:
+    """Bitset of the tiles a weapon at shooter reaches (before LoS)."""
+    return within(shooter, effective_range(weapon_range, long))
+
+
+def consolidate_sources(t: int) -> int:
+    """Tiles a unit can Consolidate into t from (they may only move 1)."""
+    return DISKS[t][1]
+
+
+def deploy_options(side: int, deployed: int = 0) -> int:
+    """
+    Tiles a player on this side may deploy to next: the edge, plus tiles
+    adjacent to those already deployed on, inside the deployment zone.
+    """
+    reach = 0
+    for t in tiles_of(deployed):
+        reach |= NEIGHBOR_MASK[t]
+    return SIDES[side] | (reach & DEPLOY_ZONES[side])
+
+
+def opposite(side: int) -> int:
+    return (side + FACINGS // 2) % FACINGS
+
+
+def turn(facing: int, steps: int) -> int:
+    """Facing after turning steps x 60 degrees (positive is left)."""
+    return (facing + steps) % FACINGS
+
+
+def describe(mask: int, limit: Optional[int] = 20) -> str:
+    """Axial coordinates of a bitset's tiles, for debugging."""
+    coords = [COORDS[t] for t in tiles_of(mask)]
+    shown = coords if limit is None else coords[:limit]
+    return " ".join(f"{q},{r}" for q, r in shown) + (" ..." if len(shown) < len(coords) else "")
+
+
+if __name__ == "__main__":
+    print(f"{TILES} tiles, edge {count(EDGE)}, deploy zone {count(DEPLOY_ZONES[0])} tiles per side")
+    for d in range(RADIUS + 1):
+        print(f"  ring {d} around the center: {count(RINGS[CENTER][d])} tiles")
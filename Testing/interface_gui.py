@@ -7,13 +7,10 @@ import datetime
 DB_FILE = "playtest_history.sqlite3"
 
 def init_if_needed():
-    """Initialize database if it doesn't exist"""
+    """Create the database, or migrate an existing one to the current schema"""
     import playtest_db
     conn = connect()
-    cur = conn.cursor()
-    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='Sessions'")
-    if not cur.fetchone():
-        playtest_db.init_db(conn)
+    playtest_db.init_db(conn)
     conn.close()
 
 def load_sessions():
@@ -0,0 +1,134 @@
+"""
+los.py
+
+Line of sight over the hex board (hexmap), kept as per-tile bitsets.
+
+A line between two tile centers is drawn twice, nudged to either side, so a
+line running exactly along a tile edge has a tile on each side to pass
+through. LoS exists when either version crosses no building; the end tiles
+never block, so a unit can see into and out of the building it stands in.
+
+The crossed tiles of every pair are computed once at import (LINES). A
+LineOfSight then keeps visible[t], the bitset of tiles t can see under the
+current building layout, and fixes it up incrementally when a building is
+placed or destroyed: only the pairs whose lines cross that tile are
+re-checked. Shooting queries are then a single AND, e.g.
+
+    los.visible[shooter] & hexmap.DISKS[shooter][weapon_range] & enemy_mask
+"""
+
+from typing import Dict, Iterable, List, Tuple
+
+import hexmap
+from hexmap import COORDS, DISKS, INDEX, TILES, tiles_of
+
+# Nudges the line off tile edges and corners (cube coordinates, summing to 0)
+_NUDGE = (1e-6, 2e-6, -3e-6)
+
+
+def _cube_round(x: float, y: float, z: float) -> Tuple[int, int]:
+    rx, ry, rz = round(x), round(y), round(z)
+    dx, dy, dz = abs(rx - x), abs(ry - y), abs(rz - z)
+    if dx > dy and dx > dz:
+        rx = -ry - rz
+    elif dy > dz:
+        ry = -rx - rz
+    return rx, rz
+
+
+def _line(a: int, b: int, sign: int) -> int:
+    """Bitset of the tiles strictly between a and b along one nudged line."""
+    (aq, ar), (bq, br) = COORDS[a], COORDS[b]
+    ax, ay, az = aq + sign * _NUDGE[0], -aq - ar + sign * _NUDGE[1], ar + sign * _NUDGE[2]
+    bx, by, bz = bq + sign * _NUDGE[0], -bq - br + sign * _NUDGE[1], br + sign * _NUDGE[2]
+    n = hexmap.DISTANCE[a][b]
+    mask = 0
+    for i in range(1, n):
+        t = i / n
+        mask |= 1 << INDEX[_cube_round(ax + (bx - ax) * t, ay + (by - ay) * t, az + (bz - az) * t)]
+    return mask
+
+
+def _build_lines() -> Tuple[List[List[Tuple[int, int]]], List[List[Tuple[int, int]]]]:
+    lines = [[(0, 0)] * TILES for _ in range(TILES)]
+    crossing: List[List[Tuple[int, int]]] = [[] for _ in range(TILES)]
+    for a in range(TILES):
+        for b in range(a + 1, TILES):
+            pair = (_line(a, b, 1), _line(a, b, -1))
+            lines[a][b] = lines[b][a] = pair
+            for t in tiles_of(pair[0] | pair[1]):
+                crossing[t].append((a, b))
+    return lines, crossing
+
+
+# LINES[a][b]: the two nudged lines' crossed tiles; CROSSING[t]: pairs (a < b) whose lines cross t
+LINES, CROSSING = _build_lines()
+
+
+def blocked(a: int, b: int, buildings: int) -> bool:
+    """Whether buildings cut every line between a and b."""
+    left, right = LINES[a][b]
+    return bool(left & buildings) and bool(right & buildings)
+
+
+class LineOfSight:
+    """
+    visible[t]: bitset of the tiles t has LoS to (t itself included).
+
+    Update with place() / remove() as buildings appear and are destroyed.
+    """
+
+    def __init__(self, buildings: Iterable[int] = ()):
+        self.buildings = 0
+        self.visible: List[int] = [hexmap.ALL] * TILES
+        for t in buildings:
+            self.place(t)
+
+    def _recheck(self, tile: int):
+        buildings = self.buildings
+        visible = self.visible
+        for a, b in CROSSING[tile]:
+            left, right = LINES[a][b]
+            if left & buildings and right & buildings:
+                visible[a] &= ~(1 << b)
+                visible[b] &= ~(1 << a)
+            else:
+                visible[a] |= 1 << b
+                visible[b] |= 1 << a
+
+    def place(self, tile: int):
+        """A building now stands on tile."""
+        if not (self.buildings >> tile) & 1:
+            self.buildings |= 1 << tile
+            self._recheck(tile)
+
+    def remove(self, tile: int):
+        """The building on tile is destroyed."""
+        if (self.buildings >> tile) & 1:
+            self.buildings &= ~(1 << tile)
+            self._recheck(tile)
+
+    def can_see(self, a: int, b: int) -> bool:
+        return (self.visible[a] >> b) & 1 == 1
+
+    def targets(self, shooter: int, weapon_range: int, candidates: int = hexmap.ALL) -> int:
+        """Tiles of candidates in range of shooter and in LoS."""
+        return self.visible[shooter] & DISKS[shooter][min(weapon_range, hexmap.MAX_DISTANCE)] & candidates
+
+    def shooters(self, target: int, ranges: Dict[int, int]) -> List[int]:
+        """Tiles of ranges ({tile: weapon range}) that can shoot target."""
+        seen = self.visible[target]
+        return [t for t, r in ranges.items() if (seen >> t) & 1 and hexmap.DISTANCE[t][target] <= r]
+
+
+if __name__ == "__main__":
+    import time
+
+    los = LineOfSight()
+    start = time.perf_counter()
+    for q, r in ((0, 0), (1, -1), (-2, 3), (3, 1)):
+        los.place(hexmap.tile(q, r))
+    elapsed = time.perf_counter() - start
+    center = hexmap.CENTER
+    print(f"4 buildings placed in {elapsed * 1e3:.2f} ms; "
+          f"center sees {hexmap.count(los.visible[center])} of {TILES} tiles")
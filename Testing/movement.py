@@ -0,0 +1,245 @@
+"""
+movement.py
+
+Movement over the hex board (hexmap), following "Extra Rules / Movement"
+of RuleBook/Game Rules.md.
+
+A vehicle's state is (tile, facing), numbered tile * 6 + facing. Every
+movement step costs 1 and is one of:
+- forward 1 tile, with one 60 degree turn (N/L/M may turn before or after
+  moving, H only after)
+- backward 1 tile, the same way, at double cost
+- a turn in place, without moving
+Aircraft move like vehicles but cannot go backward or only turn, and must
+move at least once. Infantry and hover units step to any adjacent tile.
+Leaving an enemy tile costs double (Main Phase / Moving).
+
+Each tile has SLOTS slots, one per edge. A unit fills a footprint that
+depends on its armor class (N/L/M/H: 1/2/3/4 slots) and, for vehicles, on
+its facing; it can only enter a tile if that footprint is free. Non-H
+vehicles are checked with the facing they end the step with, H vehicles
+with both the facing they move with and the one they turn to. Infantry and
+hover units only need enough free slots; aircraft fly over and ignore them.
+
+reachable() runs a Dijkstra over states and is memoized on everything it
+reads (start state, M, class, armor, occupied slots and enemy tiles), so a
+movement overlay or a simulator asking the same question twice pays once.
+"""
+
+import heapq
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import hexmap
+from hexmap import FACINGS, NEIGHBORS, TILES
+
+INFANTRY, HOVER, VEHICLE, AIRCRAFT = "infantry", "hover", "vehicle", "aircraft"
+CLASSES = (INFANTRY, HOVER, VEHICLE, AIRCRAFT)
+
+SLOTS = 6
+FULL = (1 << SLOTS) - 1
+# Slots filled per armor class
+SIZE = {"N": 1, "L": 2, "M": 3, "H": 4}
+# Slot offsets from the facing: front first, then the rear, then the sides
+_FOOTPRINT_ORDER = (0, 3, 1, 4)
+REVERSE_COST = 2
+CACHE_SIZE = 4096
+
+
+def state(tile: int, facing: int) -> int:
+    return tile * FACINGS + facing % FACINGS
+
+
+def split_state(s: int) -> Tuple[int, int]:
+    """(tile, facing) of a state."""
+    return divmod(s, FACINGS)
+
+
+def footprint(armor: str, facing: int) -> int:
+    """Slot bitmask a vehicle of this armor class fills when facing this way."""
+    mask = 0
+    for offset in _FOOTPRINT_ORDER[:SIZE[armor]]:
+        mask |= 1 << ((facing + offset) % SLOTS)
+    return mask
+
+
+def movement_class(unit: Dict[str, str]) -> str:
+    """Class of a units.csv row, from its tags (infantry when untagged)."""
+    tags = [t for t in (unit.get("tags") or "").split(",") if t]
+    for kind in (AIRCRAFT, HOVER, VEHICLE):
+        if kind in tags:
+            return kind
+    return INFANTRY
+
+
+def empty_board() -> bytes:
+    """Occupied slots per tile with nothing on the board."""
+    return bytes(TILES)
+
+
+def occupy(occupied: bytes, tile: int, slots: int) -> bytes:
+    """A copy of occupied with these slots of tile filled."""
+    board = bytearray(occupied)
+    board[tile] |= slots
+    return bytes(board)
+
+
+class Reach:
+    """
+    Result of a search: cost[s] is the cheapest movement spent to reach
+    state s, parent[s] the state it was reached from.
+    """
+
+    __slots__ = ("start", "cost", "parent", "tiles")
+
+    def __init__(self, start: int, cost: Dict[int, int], parent: Dict[int, int], tiles: int):
+        self.start = start
+        self.cost = cost
+        self.parent = parent
+        # Bitset of the tiles the unit can end its move on
+        self.tiles = tiles
+
+    def path(self, s: int) -> List[int]:
+        """States from the start to s (KeyError if s is unreachable)."""
+        if s not in self.cost:
+            raise KeyError(f"State {split_state(s)} is not reachable")
+        path = [s]
+        while path[-1] != self.start:
+            path.append(self.parent[path[-1]])
+        path.reverse()
+        return path
+
+    def cheapest(self, tile: int) -> Optional[int]:
+        """Cheapest reachable state on tile, or None."""
+        options = [s for s in range(tile * FACINGS, (tile + 1) * FACINGS) if s in self.cost]
+        return min(options, key=self.cost.__getitem__) if options else None
+
+
+def _fits(occupied: bytes, tile: int, slots: int) -> bool:
+    return not occupied[tile] & slots
+
+
+def _free_slots(occupied: bytes, tile: int) -> int:
+    return SLOTS - occupied[tile].bit_count()
+
+
+def _vehicle_steps(tile: int, facing: int, armor: str, kind: str, occupied: bytes):
+    """(next state, base cost) of every single step a vehicle can take."""
+    heavy = armor == "H"
+    moves = [(0, 1)] if kind == AIRCRAFT else [(0, 1), (3, REVERSE_COST)]
+    for direction, cost in moves:
+        # Move, then optionally turn
+        dest = NEIGHBORS[tile][(facing + direction) % FACINGS]
+        if dest >= 0:
+            moved = footprint(armor, facing)
+            for turn in (0, 1, -1):
+                final = (facing + turn) % FACINGS
+                slots = footprint(armor, final) | (moved if heavy else 0)
+                if _fits(occupied, dest, slots):
+                    yield state(dest, final), cost
+        if heavy:
+            continue
+        # Turn, then move the new way
+        for turn in (1, -1):
+            final = (facing + turn) % FACINGS
+            dest = NEIGHBORS[tile][(final + direction) % FACINGS]
+            if dest >= 0 and _fits(occupied, dest, footprint(armor, final)):
+                yield state(dest, final), cost
+    if kind != AIRCRAFT:
+        for turn in (1, -1):
+            final = (facing + turn) % FACINGS
+            # Turning in place must still fit next to the unit's own slots
+            if _fits(occupied, tile, footprint(armor, final) & ~footprint(armor, facing)):
+                yield state(tile, final), 1
+
+
+def fits(occupied: bytes, tile: int, kind: str, armor: str, facing: int) -> bool:
+    """Whether a unit can stand on tile facing this way, by the same slot rules as a step."""
+    if kind in (INFANTRY, HOVER):
+        return _free_slots(occupied, tile) >= SIZE[armor]
+    return _fits(occupied, tile, footprint(armor, facing))
+
+
+def _free_steps(tile: int, facing: int, armor: str, occupied: bytes):
+    size = SIZE[armor]
+    for dest in NEIGHBORS[tile]:
+        if dest >= 0 and _free_slots(occupied, dest) >= size:
+            yield state(dest, facing), 1
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def reachable(start: int, movement: int, kind: str, armor: str, occupied: Optional[bytes] = None,
+              enemy: int = 0) -> Reach:
+    """
+    Every state reachable from start spending at most movement.
+
+    occupied holds the filled slot bitmask of each tile, not counting the
+    moving unit (default: an empty board); enemy is the bitset of enemy
+    tiles, which cost double to leave.
+    """
+    if kind not in CLASSES:
+        raise ValueError(f"Unknown movement class {kind!r} (expected one of {', '.join(CLASSES)})")
+    if armor not in SIZE:
+        raise ValueError(f"Unknown armor class {armor!r}")
+    occupied = occupied if occupied is not None else empty_board()
+    free = kind in (INFANTRY, HOVER)
+
+    cost = {start: 0}
+    parent: Dict[int, int] = {}
+    queue = [(0, start)]
+    while queue:
+        spent, s = heapq.heappop(queue)
+        if spent > cost[s]:
+            continue
+        tile, facing = split_state(s)
+        factor = 2 if (enemy >> tile) & 1 else 1
+        steps = _free_steps(tile, facing, armor, occupied) if free else \
+            _vehicle_steps(tile, facing, armor, kind, occupied)
+        for nxt, step_cost in steps:
+            total = spent + step_cost * (factor if nxt // FACINGS != tile else 1)
+            if total <= movement and total < cost.get(nxt, movement + 1):
+                cost[nxt] = total
+                parent[nxt] = s
+                heapq.heappush(queue, (total, nxt))
+
+    if kind == AIRCRAFT:
+        # Aircraft must move: staying on the start tile is not an option
+        start_tile = start // FACINGS
+        tiles = hexmap.mask_of(s // FACINGS for s in cost if s // FACINGS != start_tile)
+    else:
+        tiles = hexmap.mask_of(s // FACINGS for s in cost)
+    return Reach(start, cost, parent, tiles)
+
+
+def reachable_for(unit: Dict[str, str], tile: int, facing: int, movement: Optional[int] = None,
+                  occupied: Optional[bytes] = None, enemy: int = 0) -> Reach:
+    """reachable() for a units.csv row, moving up to its M unless movement is given."""
+    if movement is None:
+        movement = int(unit.get("M") or 0)
+    return reachable(state(tile, facing), movement, movement_class(unit), unit["A"], occupied, enemy)
+
+
+def describe_path(path: Sequence[int]) -> str:
+    parts = []
+    for s in path:
+        tile, facing = split_state(s)
+        q, r = hexmap.COORDS[tile]
+        parts.append(f"({q},{r})>{facing}")
+    return " ".join(parts)
+
+
+if __name__ == "__main__":
+    import time
+
+    start = state(hexmap.CENTER, 0)
+    for kind, armor in ((INFANTRY, "N"), (VEHICLE, "M"), (VEHICLE, "H"), (AIRCRAFT, "L")):
+        t0 = time.perf_counter()
+        reach = reachable(start, 4, kind, armor)
+        t1 = time.perf_counter()
+        reachable(start, 4, kind, armor)
+        t2 = time.perf_counter()
+        print(f"{kind:9} {armor}: {hexmap.count(reach.tiles):3} tiles, {len(reach.cost):4} states "
+              f"in {(t1 - t0) * 1e3:.2f} ms (cached {(t2 - t1) * 1e6:.1f} us)")
+    far = reachable(start, 4, VEHICLE, "M").cheapest(hexmap.tile(-2, 0))
+    if far is not None:
+        print("M vehicle to (-2,0):", describe_path(reachable(start, 4, VEHICLE, "M").path(far)))
@@ -13,12 +13,17 @@ Features:
 - Tags (many-to-many via ActionTags)
 - Querying and basic stats
 
+The schema is versioned with PRAGMA user_version: migrate() applies every
+step in MIGRATIONS the file has not seen yet, so older
+playtest_history.sqlite3 files are brought forward in place.
+
 Run as a script to exercise demo usage at bottom.
 """
 
 import sqlite3
 import datetime
 import csv
+import json
 from collections import Counter
 from typing import List, Optional, Iterable, Tuple, Dict, Any
 
@@ -37,13 +42,12 @@ def clear_db(conn: sqlite3.Connection):
     tables = c.fetchall()
     for table in tables:
         c.execute(f"DROP TABLE IF EXISTS {table[0]};")
+    c.execute("PRAGMA user_version = 0;")
     conn.commit()
     c.execute("PRAGMA foreign_keys = ON;")
 
-def init_db(conn: sqlite3.Connection):
-    c = conn.cursor()
-    # Enable foreign keys
-    c.execute("PRAGMA foreign_keys = ON;")
+def _create_tables(c: sqlite3.Cursor):
+    """Migration 1: the original schema (a no-op on files created before versioning)."""
 
     # Sessions
     c.execute("""
@@ -109,7 +113,75 @@ def init_db(conn: sqlite3.Connection):
     );
     """)
 
+
+def _add_turn_order(c: sqlite3.Cursor):
+    """Migration 2: Actions.turn_order, the action's position in its session."""
+    c.execute("ALTER TABLE Actions ADD COLUMN turn_order INTEGER")
+    c.execute("""
+    UPDATE Actions SET turn_order = numbered.n
+    FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY id) AS n FROM Actions) AS numbered
+    WHERE numbered.id = Actions.id
+    """)
+
+
+def _add_participant_role(c: sqlite3.Cursor):
+    """Migration 3: ActionParticipants.role ("primary" / "secondary"), filled from is_primary."""
+    c.execute("ALTER TABLE ActionParticipants ADD COLUMN role TEXT")
+    c.execute("UPDATE ActionParticipants SET role = CASE WHEN is_primary THEN 'primary' ELSE 'secondary' END")
+
+
+def _add_indexes(c: sqlite3.Cursor):
+    """Migration 4: indexes for the lookups and filters in this module."""
+    # actions_for_session, count_actions_by_type and tag_frequency filter on the
+    # session; type / player cover the rest of actions_filter
+    c.execute("CREATE INDEX IF NOT EXISTS idx_actions_session ON Actions(session_id, turn_order, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_actions_session_type ON Actions(session_id, type)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_actions_type ON Actions(type)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_actions_player ON Actions(player_id)")
+    # Covering: a session's participants are read without touching the table
+    c.execute("CREATE INDEX IF NOT EXISTS idx_participants_action "
+              "ON ActionParticipants(action_id, is_primary, id, name_text, role)")
+    # LIKE '%x%' cannot seek, but scanning this is cheaper than the table
+    c.execute("CREATE INDEX IF NOT EXISTS idx_participants_name ON ActionParticipants(name_text, action_id)")
+    # The primary key covers (action_id, tag_id); filters by tag go the other way
+    c.execute("CREATE INDEX IF NOT EXISTS idx_actiontags_tag ON ActionTags(tag_id, action_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_version ON Sessions(version)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sessionplayers_player ON SessionPlayers(player_id)")
+
+
+# MIGRATIONS[i] brings a file from user_version i to i + 1. Append only: never
+# edit a step that has shipped, add a new one.
+MIGRATIONS = [_create_tables, _add_turn_order, _add_participant_role, _add_indexes]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply pending migrations, each in its own transaction. Returns the schema version."""
+    version = schema_version(conn)
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema version {version} is newer than this code ({SCHEMA_VERSION})")
     conn.commit()
+    c = conn.cursor()
+    for step in range(version, SCHEMA_VERSION):
+        try:
+            c.execute("BEGIN")
+            MIGRATIONS[step](c)
+            c.execute(f"PRAGMA user_version = {step + 1}")
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+    return SCHEMA_VERSION
+
+
+def init_db(conn: sqlite3.Connection):
+    """Create the schema, or bring an existing file up to SCHEMA_VERSION."""
+    conn.execute("PRAGMA foreign_keys = ON;")
+    migrate(conn)
 
 
 # CRUD helpers
@@ -173,6 +245,11 @@ def ensure_tag(conn: sqlite3.Connection, tag_name: str) -> int:
         return cur.fetchone()[0]
 
 
+def _next_turn_order(cur: sqlite3.Cursor, session_id: int) -> int:
+    cur.execute("SELECT COALESCE(MAX(turn_order), 0) + 1 FROM Actions WHERE session_id = ?", (session_id,))
+    return cur.fetchone()[0]
+
+
 def add_action(conn: sqlite3.Connection,
                session_id: int,
                player_name: Optional[str],
@@ -200,24 +277,24 @@ def add_action(conn: sqlite3.Connection,
             raise ValueError(f"Player {player_name} not found in session {session_id}")
         player_id = player[0]
     
-    # Create action
+    # Create action, after the session's last one
     cur.execute(
-        "INSERT INTO Actions (session_id, player_id, type, notes) VALUES (?, ?, ?, ?)",
-        (session_id, player_id, type, notes)
+        "INSERT INTO Actions (session_id, player_id, type, notes, turn_order) VALUES (?, ?, ?, ?, ?)",
+        (session_id, player_id, type, notes, _next_turn_order(cur, session_id))
     )
     action_id = cur.lastrowid
 
     # Add primary participant if provided
     if primary_participant:
         cur.execute(
-            "INSERT INTO ActionParticipants (action_id, is_primary, name_text) VALUES (?, ?, ?)",
+            "INSERT INTO ActionParticipants (action_id, is_primary, name_text, role) VALUES (?, ?, ?, 'primary')",
             (action_id, True, primary_participant)
         )
     
     # Add secondary participants if provided
     if secondary_participants:
         cur.executemany(
-            "INSERT INTO ActionParticipants (action_id, is_primary, name_text) VALUES (?, ?, ?)",
+            "INSERT INTO ActionParticipants (action_id, is_primary, name_text, role) VALUES (?, ?, ?, 'secondary')",
             [(action_id, False, name) for name in secondary_participants]
         )
 
@@ -233,9 +310,76 @@ def add_action(conn: sqlite3.Connection,
     return action_id
 
 
+def add_actions_bulk(conn: sqlite3.Connection, session_id: int, actions: Iterable[Dict[str, Any]]) -> int:
+    """
+    Add many actions to a session in a single transaction.
+
+    Each action is a dict with the keyword arguments of add_action
+    ("player_name", "type", "notes", "primary_participant",
+    "secondary_participants", "tags"). Players and tags are looked up once
+    each and rows are written with executemany, so thousands of actions cost
+    one commit instead of several per action. Returns the number of actions added.
+    """
+    cur = conn.cursor()
+    player_ids: Dict[str, Optional[int]] = {}
+    tag_ids: Dict[str, int] = {}
+    participants = []
+    action_tags = []
+    added = 0
+    try:
+        turn_order = _next_turn_order(cur, session_id)
+        for a in actions:
+            name = a.get("player_name")
+            if name and name not in player_ids:
+                cur.execute("SELECT id FROM Players WHERE name = ?", (name,))
+                player = cur.fetchone()
+                if not player:
+                    raise ValueError(f"Player {name} not found in session {session_id}")
+                player_ids[name] = player[0]
+            cur.execute(
+                "INSERT INTO Actions (session_id, player_id, type, notes, turn_order) VALUES (?, ?, ?, ?, ?)",
+                (session_id, player_ids.get(name) if name else None, a.get("type"), a.get("notes"),
+                 turn_order + added)
+            )
+            action_id = cur.lastrowid
+            added += 1
+            if a.get("primary_participant"):
+                participants.append((action_id, True, a["primary_participant"], "primary"))
+            participants.extend((action_id, False, s, "secondary") for s in a.get("secondary_participants") or [])
+            for t in dict.fromkeys(a.get("tags") or []):
+                if t not in tag_ids:
+                    cur.execute("INSERT OR IGNORE INTO Tags (name) VALUES (?)", (t,))
+                    cur.execute("SELECT id FROM Tags WHERE name = ?", (t,))
+                    tag_ids[t] = cur.fetchone()[0]
+                action_tags.append((action_id, tag_ids[t]))
+
+        cur.executemany(
+            "INSERT INTO ActionParticipants (action_id, is_primary, name_text, role) VALUES (?, ?, ?, ?)",
+            participants
+        )
+        cur.executemany("INSERT OR IGNORE INTO ActionTags (action_id, tag_id) VALUES (?, ?)", action_tags)
+    except Exception:
+        conn.rollback()
+        raise
+    conn.commit()
+    return added
+
+
 # Query / filter helpers
 
 def actions_for_session(conn: sqlite3.Connection, session_id: int) -> List[Dict[str, Any]]:
+    """
+    All actions of a session with their participants and tags, in id order.
+
+    Two queries whatever the session's size: the actions, then every
+    participant and tag of the session's actions in one pass, grouped here.
+    The run time still grows linearly with the number of actions; only the
+    time per action stays flat (see bench_actions.py).
+
+    Tags come in tag id order (the order they were first created in). The
+    per-action queries this replaced had no ORDER BY and returned them in
+    whatever order SQLite picked.
+    """
     cur = conn.cursor()
     cur.execute("""
     SELECT a.id, p.name as player_name, a.type, a.notes
@@ -244,41 +388,46 @@ def actions_for_session(conn: sqlite3.Connection, session_id: int) -> List[Dict[
     WHERE a.session_id = ?
     ORDER BY a.id ASC
     """, (session_id,))
-    rows = cur.fetchall()
     actions = []
-    for r in rows:
-        aid = r[0]
-        # Get participants
-        cur.execute("""
-            SELECT is_primary, name_text 
-            FROM ActionParticipants 
-            WHERE action_id = ?
-            ORDER BY is_primary DESC, id ASC
-        """, (aid,))
-        participants = cur.fetchall()
-        
-        # Split into primary and secondary
-        primary = next((p[1] for p in participants if p[0]), None)
-        secondary = [p[1] for p in participants if not p[0]]
-        
-        # Get tags
-        cur.execute("""
-            SELECT t.name 
-            FROM Tags t 
-            JOIN ActionTags at ON t.id = at.tag_id 
-            WHERE at.action_id = ?
-        """, (aid,))
-        tags = [t[0] for t in cur.fetchall()]
-        
-        actions.append({
-            "id": aid,
+    by_id = {}
+    for r in cur.fetchall():
+        action = {
+            "id": r[0],
             "player": r[1],
             "type": r[2],
             "notes": r[3],
-            "primary_participant": primary,
-            "secondary_participants": secondary,
-            "tags": tags
-        })
+            "primary_participant": None,
+            "secondary_participants": [],
+            "tags": []
+        }
+        actions.append(action)
+        by_id[r[0]] = action
+    if not actions:
+        return actions
+
+    # kind 0: participants (primary first, then by id); kind 1: tags
+    cur.execute("""
+    SELECT ap.action_id, 0 AS kind, ap.is_primary, ap.name_text, ap.id
+    FROM ActionParticipants ap
+    JOIN Actions a ON a.id = ap.action_id
+    WHERE a.session_id = ?
+    UNION ALL
+    SELECT at.action_id, 1 AS kind, 0, t.name, at.tag_id
+    FROM ActionTags at
+    JOIN Actions a ON a.id = at.action_id
+    JOIN Tags t ON t.id = at.tag_id
+    WHERE a.session_id = ?
+    ORDER BY 1, 2, 3 DESC, 5
+    """, (session_id, session_id))
+    for action_id, kind, is_primary, name, _ in cur.fetchall():
+        action = by_id[action_id]
+        if kind == 1:
+            action["tags"].append(name)
+        elif is_primary:
+            if action["primary_participant"] is None:
+                action["primary_participant"] = name
+        else:
+            action["secondary_participants"].append(name)
     return actions
 
 
@@ -293,6 +442,7 @@ def actions_filter(conn: sqlite3.Connection,
     """
     Flexible ad-hoc filter. Any argument can be None (ignored).
     participant_name matches ActionParticipants.name_text (substring match).
+    Results are ordered by session, then turn order.
     """
     cur = conn.cursor()
     params = []
@@ -311,11 +461,12 @@ def actions_filter(conn: sqlite3.Connection,
         params.append(action_type)
 
     if tag is not None:
-        where_clauses.append("t.name = ?")
+        where_clauses.append("""EXISTS (SELECT 1 FROM ActionTags at JOIN Tags t ON t.id = at.tag_id
+                                        WHERE at.action_id = a.id AND t.name = ?)""")
         params.append(tag)
 
     if participant_name is not None:
-        where_clauses.append("ap.name_text LIKE ?")
+        where_clauses.append("EXISTS (SELECT 1 FROM ActionParticipants ap WHERE ap.action_id = a.id AND ap.name_text LIKE ?)")
         params.append(f"%{participant_name}%")
 
     if version is not None:
@@ -328,31 +479,45 @@ def actions_filter(conn: sqlite3.Connection,
     FROM Actions a
     LEFT JOIN Players p ON p.id = a.player_id
     LEFT JOIN Sessions s ON s.id = a.session_id
-    LEFT JOIN ActionTags at ON at.action_id = a.id
-    LEFT JOIN Tags t ON t.id = at.tag_id
-    LEFT JOIN ActionParticipants ap ON ap.action_id = a.id
     {where_sql}
-    GROUP BY a.id
-    ORDER BY a.turn_order ASC, a.id ASC
+    ORDER BY a.session_id ASC, a.turn_order ASC, a.id ASC
     """
     cur.execute(query, params)
-    rows = cur.fetchall()
-    # reuse actions_for_session-like population
     results = []
-    for r in rows:
-        aid = r[0]
-        participants = cur.execute("SELECT role, name_text FROM ActionParticipants WHERE action_id = ?", (aid,)).fetchall()
-        tags = cur.execute("SELECT t.name FROM Tags t JOIN ActionTags at ON t.id = at.tag_id WHERE at.action_id = ?", (aid,)).fetchall()
-        results.append({
-            "id": aid,
+    by_id = {}
+    for r in cur.fetchall():
+        action = {
+            "id": r[0],
             "turn_order": r[1],
             "player": r[2],
             "type": r[3],
             "notes": r[4],
             "version": r[5],
-            "participants": [{"role": pr[0], "name": pr[1]} for pr in participants],
-            "tags": [t[0] for t in tags]
-        })
+            "participants": [],
+            "tags": []
+        }
+        results.append(action)
+        by_id[r[0]] = action
+    if not results:
+        return results
+
+    # Participants and tags of every matched action in one query (ids passed as a JSON array)
+    cur.execute("""
+    SELECT ap.action_id, 0 AS kind, ap.role, ap.name_text, ap.id
+    FROM ActionParticipants ap
+    WHERE ap.action_id IN (SELECT value FROM json_each(?))
+    UNION ALL
+    SELECT at.action_id, 1 AS kind, NULL, t.name, at.tag_id
+    FROM ActionTags at
+    JOIN Tags t ON t.id = at.tag_id
+    WHERE at.action_id IN (SELECT value FROM json_each(?))
+    ORDER BY 1, 2, 5
+    """, (json.dumps(list(by_id)),) * 2)
+    for action_id, kind, role, name, _ in cur.fetchall():
+        if kind == 1:
+            by_id[action_id]["tags"].append(name)
+        else:
+            by_id[action_id]["participants"].append({"role": role, "name": name})
     return results
 
 
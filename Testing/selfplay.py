@@ -0,0 +1,526 @@
+"""
+selfplay.py
+
+Headless AI self-play that logs every game into the playtest database.
+
+Each game draws two army lists from the catalog (Data/units.csv) within an
+MP / Mat budget, deploys them in opposite deployment zones (hexmap) around a
+few neutral buildings, and lets two agents play it out on a GameState:
+- random: any legal action
+- greedy: the Salvo with the most expected damage, else capture or close in
+- search: flat Monte Carlo, applying each candidate on the GameState with
+  sampled dice (a Major followed by its best Minor reply) and undoing it
+  afterwards; positions are valued by material, pips and how close the
+  units stand to what they should attack or capture
+
+Each player takes the Major action first and picks the Minor one only after
+it was applied, so every choice sees the board as it is.
+
+Shots roll real penetration dice (penetration / salvo_dp face counts) within
+weapon range (Long +2), LoS (los) and the front arc of Frontal weapons
+(arcs); vehicles move with movement.reachable(). Embark, Disembark and
+Consolidate are in GameState but not played by these agents yet.
+
+Games run over a process pool; the main process writes each finished game
+as a session with playtest_db.add_actions_bulk(), one transaction per game.
+
+Usage: python selfplay.py --games 1000 [--workers 8] [--agents greedy search] [--db playtest_history.sqlite3]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "Data")
+sys.path.insert(0, DATA_DIR)
+
+from catalog import Catalog, load_catalog, split_ids  # noqa: E402
+from combat_sim import BRITTLE  # noqa: E402
+from penetration import DIE, PenetrationTable  # noqa: E402
+from salvo_dp import loadout_counts  # noqa: E402
+
+import arcs  # noqa: E402
+import hexmap  # noqa: E402
+import playtest_db  # noqa: E402
+from game_state import CAPTURED, MOVED, SHOT, TRANSPORT_CAPACITY, Action, GameState, IllegalAction  # noqa: E402
+from los import LineOfSight  # noqa: E402
+
+AGENTS = ("random", "greedy", "search")
+DEFAULT_BUDGET = (150, 150)
+DEFAULT_TURNS = 8
+BUILDINGS = 5
+BUILDING_PIPS = 4
+# Player 0 deploys on side 0 and faces side 3, player 1 the other way round
+PLAYER_SIDES = (0, 3)
+SEARCH_SAMPLES = 4
+# Evaluation weight of each tile between a unit and its nearest goal
+DISTANCE_WEIGHT = 0.1
+FRONTAL_KEYWORD = "Frontal"
+TRANSPORT_TAG = "Transport"
+SELFPLAY_TAG = "selfplay"
+
+
+class Loadout:
+    """What a unit fires: per weapon its range (with Long) and whether it is Frontal."""
+
+    __slots__ = ("weapons", "ranges", "frontal")
+
+    def __init__(self, catalog: Catalog, unit: Dict[str, str]):
+        self.weapons = [w for w in split_ids(unit.get("weapons")) if w in catalog.weapons_by_uuid]
+        rows = [catalog.weapons_by_uuid[w] for w in self.weapons]
+        self.ranges = [hexmap.weapon_range(w, catalog.weapon_keyword_names(w)) for w in rows]
+        self.frontal = [FRONTAL_KEYWORD in catalog.weapon_keyword_names(w) for w in rows]
+
+
+class Game:
+    """A GameState plus what the agents and dice need: rows, loadouts, LoS and an RNG."""
+
+    def __init__(self, catalog: Catalog, table: PenetrationTable, armies: Sequence[List[Dict[str, str]]],
+                 rng: random.Random):
+        self.catalog = catalog
+        self.table = table
+        self.rng = rng
+        self.state = GameState()
+        self.rows: List[Dict[str, str]] = []
+        self.loadouts: List[Loadout] = []
+        self._faces: Dict[Tuple[int, int, bool], List[int]] = {}
+
+        middle = [t for t in range(hexmap.TILES)
+                  if not any(hexmap.has(hexmap.DEPLOY_ZONES[s], t) for s in PLAYER_SIDES)]
+        building_tiles = rng.sample(middle, BUILDINGS)
+        for t in building_tiles:
+            self.state.add_building(t, (BUILDING_PIPS, 0, 0))
+        self.los = LineOfSight(building_tiles)
+
+        for player, army in enumerate(armies):
+            side = PLAYER_SIDES[player]
+            facing = hexmap.opposite(side)
+            deployed = 0
+            for unit in army:
+                options = list(hexmap.tiles_of(hexmap.deploy_options(side, deployed) & ~self.state.occupied()))
+                if not options:
+                    break
+                tile = rng.choice(options)
+                deployed |= 1 << tile
+                transport = TRANSPORT_TAG in catalog.unit_tag_names(unit)
+                self.state.add_unit(unit, player, tile, facing, capacity=TRANSPORT_CAPACITY if transport else 0)
+                self.rows.append(unit)
+                self.loadouts.append(Loadout(catalog, unit))
+
+    # Shooting
+
+    def faces(self, shooter: int, target: int, shot: bool = False) -> List[int]:
+        """Penetrating faces of each of shooter's weapons against target."""
+        key = (shooter, target, shot)
+        faces = self._faces.get(key)
+        if faces is None:
+            row = self.rows[target]
+            faces = self._faces[key] = loadout_counts(self.table, self.loadouts[shooter].weapons, row["A"],
+                                                      brittle=BRITTLE in (row.get("abilities") or ""), shot=shot)
+        return faces
+
+    def weapons_on(self, shooter: int, target: int) -> List[int]:
+        """Indexes of shooter's weapons that can fire at target (range, LoS, front arc)."""
+        s = self.state
+        here, there = s.tile[shooter], s.tile[target]
+        if not self.los.can_see(here, there):
+            return []
+        distance = hexmap.DISTANCE[here][there]
+        loadout = self.loadouts[shooter]
+        return [i for i, r in enumerate(loadout.ranges)
+                if distance <= r and (not loadout.frontal[i] or arcs.in_arc(here, s.facing[shooter], there))]
+
+    def expected_hits(self, shooter: int, target: int, weapons: Sequence[int], shot: bool = False) -> float:
+        faces = self.faces(shooter, target, shot)
+        return min(sum(faces[i] for i in weapons) / DIE, self.state.health[target])
+
+    def roll(self, shooter: int, target: int, weapons: Sequence[int], shot: bool = False) -> int:
+        faces = self.faces(shooter, target, shot)
+        return sum(self.rng.randrange(DIE) < faces[i] for i in weapons)
+
+    # Candidate actions
+
+    def enemies_of(self, player: int) -> List[int]:
+        s = self.state
+        return [i for i in s.units_of(1 - player) if s.carrier[i] < 0]
+
+    def attacks(self, unit: int, shot: bool) -> List[Tuple[int, List[int]]]:
+        """(target, weapons) pairs; a Shot fires only the weapon most likely to get through."""
+        options = []
+        for target in self.enemies_of(self.state.player[unit]):
+            weapons = self.weapons_on(unit, target)
+            if not weapons:
+                continue
+            if shot:
+                faces = self.faces(unit, target, True)
+                weapons = [max(weapons, key=lambda i: faces[i])]
+            options.append((target, weapons))
+        return options
+
+    def destinations(self, unit: int) -> Dict[int, int]:
+        """Tile -> facing of the cheapest way to end an Advance there."""
+        reach = self.state.reach(unit)
+        out = {}
+        for t in hexmap.tiles_of(reach.tiles):
+            best = reach.cheapest(t)
+            if best is not None:
+                out[t] = best % hexmap.FACINGS
+        return out
+
+    def goals(self, player: int) -> List[int]:
+        """Tiles player's units head for: enemy units and buildings player does not control."""
+        s = self.state
+        goals = hexmap.mask_of(s.tile[e] for e in self.enemies_of(player))
+        goals |= hexmap.mask_of(t for b, t in enumerate(s.building_tile) if s.controller(b) != player)
+        return list(hexmap.tiles_of(goals))
+
+    def approach(self, player: int) -> int:
+        """Total distance from player's units to their nearest goal."""
+        s = self.state
+        goals = self.goals(player)
+        if not goals:
+            return 0
+        return sum(min(hexmap.DISTANCE[s.tile[u]][g] for g in goals) for u in s.units_of(player))
+
+    def score(self, player: int) -> float:
+        """Own H plus controlled pips, minus the opponent's."""
+        s = self.state
+        total = 0.0
+        for i in range(len(s.names)):
+            total += s.health[i] if s.player[i] == player else -s.health[i]
+        for b in range(len(s.building_tile)):
+            pips = s.building_pips(b)
+            total += 0.5 * (pips[1 + player] - pips[2 - player])
+        return total
+
+    def evaluate(self, player: int) -> float:
+        """score() plus position: units nearer their goals than the opponent's are worth more."""
+        return self.score(player) - DISTANCE_WEIGHT * (self.approach(player) - self.approach(1 - player))
+
+    def over(self) -> bool:
+        return not self.state.units_of(0) or not self.state.units_of(1)
+
+
+# Agents: major() and minor() return the action to take, dice already
+# rolled, or None to pass. minor() is asked after the Major action was applied.
+
+def _majors(game: Game, player: int) -> List[Action]:
+    s = game.state
+    actions = []
+    for u in s.units_of(player):
+        if s.carrier[u] >= 0:
+            continue
+        for target, weapons in game.attacks(u, shot=False):
+            actions.append(Action("Salvo", u, target=target, damage=game.roll(u, target, weapons)))
+        b = s.building_at(s.tile[u])
+        if b >= 0 and s.control[u] > 0:
+            actions.append(Action("Capture", u, target=b))
+        for t, facing in game.destinations(u).items():
+            if t != s.tile[u]:
+                actions.append(Action("Advance", u, tile=t, facing=facing))
+    return actions
+
+
+def _minors(game: Game, player: int) -> List[Action]:
+    s = game.state
+    actions = []
+    for u in s.units_of(player):
+        if s.carrier[u] >= 0:
+            continue
+        if not s.flags[u] & SHOT:
+            for target, weapons in game.attacks(u, shot=True):
+                actions.append(Action("Shot", u, target=target, damage=game.roll(u, target, weapons, shot=True)))
+        b = s.building_at(s.tile[u])
+        if b >= 0 and s.control[u] > 0 and not s.flags[u] & CAPTURED:
+            actions.append(Action("Control", u, target=b))
+        if s.movement[u] > 1 and not s.flags[u] & MOVED:
+            actions.extend(Action("Move", u, tile=t) for t in hexmap.NEIGHBORS[s.tile[u]]
+                           if t >= 0 and s.fits(u, t))
+    return actions
+
+
+class Agent(ABC):
+    """Chooses one of the legal options (None to pass); major() and minor() offer it each half of a turn."""
+
+    name = ""
+
+    @abstractmethod
+    def pick(self, game: Game, player: int, options: List[Action]) -> Optional[Action]:
+        ...
+
+    def major(self, game: Game, player: int) -> Optional[Action]:
+        return self.pick(game, player, _majors(game, player))
+
+    def minor(self, game: Game, player: int) -> Optional[Action]:
+        return self.pick(game, player, _minors(game, player))
+
+
+class RandomAgent(Agent):
+    name = "random"
+
+    def pick(self, game: Game, player: int, options: List[Action]) -> Optional[Action]:
+        return game.rng.choice(options) if options else None
+
+
+def _shot_value(game: Game, action: Action) -> float:
+    # Expected damage, preferring targets close to dying
+    weapons = game.weapons_on(action.unit, action.target)
+    hits = game.expected_hits(action.unit, action.target, weapons, action.type == "Shot")
+    return hits / max(1, game.state.health[action.target])
+
+
+class GreedyAgent(Agent):
+    name = "greedy"
+
+    def _closest(self, game: Game, player: int, options: Sequence[Action]) -> Optional[Action]:
+        # The move that ends nearest an enemy or an uncontrolled building
+        goal_tiles = game.goals(player)
+        if not goal_tiles or not options:
+            return None
+        return min(options, key=lambda a: min(hexmap.DISTANCE[a.tile][g] for g in goal_tiles))
+
+    def pick(self, game: Game, player: int, options: List[Action]) -> Optional[Action]:
+        s = game.state
+        shots = [a for a in options if a.type in ("Salvo", "Shot")]
+        if shots:
+            return max(shots, key=lambda a: _shot_value(game, a))
+        captures = [a for a in options if a.type in ("Capture", "Control") and s.controller(a.target) != player]
+        if captures:
+            return captures[0]
+        return self._closest(game, player, [a for a in options if a.type in ("Advance", "Move")])
+
+
+class SearchAgent(Agent):
+    """
+    Flat Monte Carlo with Game.evaluate(): each Major candidate is valued by
+    its best Minor reply, each Minor candidate on its own, SEARCH_SAMPLES
+    dice draws each. Passing is tried last and ties go to the first
+    candidate in a shuffled order, so doing nothing only wins when it is
+    strictly better.
+    """
+
+    name = "search"
+
+    def __init__(self, samples: int = SEARCH_SAMPLES, width: int = 12):
+        self.samples = samples
+        # Candidates kept per action kind: the best shots by expected damage, a random sample of the rest
+        self.width = width
+
+    def _candidates(self, game: Game, options: List[Action]) -> List[Optional[Action]]:
+        shots = sorted((a for a in options if a.type in ("Salvo", "Shot")), key=lambda a: -_shot_value(game, a))
+        others = [a for a in options if a.type not in ("Salvo", "Shot")]
+        game.rng.shuffle(others)
+        candidates: List[Optional[Action]] = shots[:self.width] + others[:self.width]
+        game.rng.shuffle(candidates)
+        return candidates + [None]
+
+    def _resample(self, game: Game, action: Action) -> Action:
+        if action.type not in ("Salvo", "Shot"):
+            return action
+        shot = action.type == "Shot"
+        weapons = game.weapons_on(action.unit, action.target)
+        if shot:
+            faces = game.faces(action.unit, action.target, True)
+            weapons = [max(weapons, key=lambda i: faces[i])]
+        return action._replace(damage=game.roll(action.unit, action.target, weapons, shot))
+
+    def _after(self, game: Game, action: Optional[Action], value: Callable[[], float]) -> Optional[float]:
+        """value() with action applied (None if it is illegal), the state left as it was."""
+        if action is None:
+            return value()
+        try:
+            game.state.apply(action)
+        except IllegalAction:
+            return None
+        try:
+            return value()
+        finally:
+            game.state.undo()
+
+    def _best(self, game: Game, candidates: List[Optional[Action]], value: Callable[[], float]) -> Optional[Action]:
+        best, best_value = None, float("-inf")
+        for action in candidates:
+            samples = self.samples if action is not None and action.type in ("Salvo", "Shot") else 1
+            total = 0.0
+            for _ in range(samples):
+                v = self._after(game, action and self._resample(game, action), value)
+                if v is None:
+                    break
+                total += v
+            else:
+                if total / samples > best_value:
+                    best, best_value = action, total / samples
+        return best
+
+    def _reply(self, game: Game, player: int) -> float:
+        """Value of the best Minor action from here (its dice as drawn)."""
+        best = game.evaluate(player)
+        for action in _minors(game, player):
+            v = self._after(game, action, lambda: game.evaluate(player))
+            if v is not None and v > best:
+                best = v
+        return best
+
+    def pick(self, game: Game, player: int, options: List[Action]) -> Optional[Action]:
+        return self._best(game, self._candidates(game, options), lambda: game.evaluate(player))
+
+    def major(self, game: Game, player: int) -> Optional[Action]:
+        return self._best(game, self._candidates(game, _majors(game, player)), lambda: self._reply(game, player))
+
+
+AGENT_TYPES = {a.name: a for a in (RandomAgent, GreedyAgent, SearchAgent)}
+
+
+# Games
+
+def draw_army(catalog: Catalog, rng: random.Random, budget: Tuple[int, int]) -> List[Dict[str, str]]:
+    """Random units until nothing else fits the (MP, Mat) budget."""
+    mp, mat = budget
+    army = []
+    while True:
+        fits = [u for u in catalog.units if int(u.get("MP") or 0) <= mp and int(u.get("Mat") or 0) <= mat]
+        if not fits:
+            return army
+        unit = rng.choice(fits)
+        army.append(unit)
+        mp -= int(unit.get("MP") or 0)
+        mat -= int(unit.get("Mat") or 0)
+
+
+def _describe_tile(t: int) -> str:
+    q, r = hexmap.COORDS[t]
+    return f"Tile {q},{r}"
+
+
+def _record(game: Game, player_names: Sequence[str], action: Action, turn: int) -> Dict:
+    s = game.state
+    unit_name = game.rows[action.unit]["name"]
+    secondary, notes, tags = [], None, [SELFPLAY_TAG]
+    if action.type in ("Salvo", "Shot"):
+        secondary = [game.rows[action.target]["name"]]
+        notes = f"{action.damage} H"
+        if s.health[action.target] == 0:
+            tags.append("kill")
+    elif action.type in ("Capture", "Control"):
+        secondary = [_describe_tile(s.building_tile[action.target])]
+    elif action.tile >= 0:
+        secondary = [_describe_tile(action.tile)]
+    return {
+        "player_name": player_names[s.player[action.unit]],
+        "type": action.type,
+        "notes": f"Turn {turn}" + (f": {notes}" if notes else ""),
+        "primary_participant": unit_name,
+        "secondary_participants": secondary,
+        "tags": tags,
+    }
+
+
+def play_game(seed: int, agents: Tuple[str, str] = ("greedy", "search"), budget: Tuple[int, int] = DEFAULT_BUDGET,
+              turns: int = DEFAULT_TURNS, data_dir: str = DATA_DIR) -> Dict:
+    """Play one game; returns the session to log (players, notes, actions)."""
+    rng = random.Random(seed)
+    catalog, table = _resources(data_dir)
+    game = Game(catalog, table, [draw_army(catalog, rng, budget) for _ in range(2)], rng)
+    players = [AGENT_TYPES[name]() for name in agents]
+    player_names = [f"AI {p.name} ({side})" for side, p in zip(("A", "B"), players)]
+
+    log = []
+    for turn in range(1, turns + 1):
+        for player in (0, 1):
+            if game.over():
+                break
+            agent = players[player]
+            # The Minor action is chosen only once the Major one is on the board
+            for choose in (agent.major, agent.minor):
+                action = choose(game, player)
+                if action is None:
+                    continue
+                try:
+                    game.state.apply(action)
+                except IllegalAction:
+                    continue
+                log.append(_record(game, player_names, action, turn))
+            game.state.end_turn()
+        if game.over():
+            break
+
+    scores = [game.score(0), game.score(1)]
+    winner = "draw" if scores[0] == scores[1] else player_names[0 if scores[0] > scores[1] else 1]
+    return {
+        "players": player_names,
+        "notes": f"Self-play seed {seed}, {turn} turns, winner: {winner} (score {scores[0]:+.1f})",
+        "actions": log,
+    }
+
+
+_RESOURCES: Dict[str, Tuple[Catalog, PenetrationTable]] = {}
+
+
+def _resources(data_dir: str) -> Tuple[Catalog, PenetrationTable]:
+    # Loaded once per worker process
+    if data_dir not in _RESOURCES:
+        catalog = load_catalog(data_dir)
+        _RESOURCES[data_dir] = (catalog, PenetrationTable(catalog.weapons))
+    return _RESOURCES[data_dir]
+
+
+def _play(args) -> Dict:
+    return play_game(*args)
+
+
+def run(games: int, db_path: str = playtest_db.DB_PATH, workers: int = 1, agents: Tuple[str, str] = ("greedy", "search"),
+        version: str = "selfplay", seed: int = 0, budget: Tuple[int, int] = DEFAULT_BUDGET,
+        turns: int = DEFAULT_TURNS) -> int:
+    """Play games and log each as a session; returns the number of actions written."""
+    jobs = [(seed + i, agents, budget, turns) for i in range(games)]
+    conn = playtest_db.connect(db_path)
+    playtest_db.init_db(conn)
+    written = 0
+    try:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = pool.map(_play, jobs, chunksize=max(1, games // (workers * 8)))
+                for result in results:
+                    written += _log(conn, result, version)
+        else:
+            for job in jobs:
+                written += _log(conn, _play(job), version)
+    finally:
+        conn.close()
+    return written
+
+
+def _log(conn, result: Dict, version: str) -> int:
+    session_id = playtest_db.add_session(conn, version, result["players"][0], result["players"][1],
+                                         notes=result["notes"])
+    return playtest_db.add_actions_bulk(conn, session_id, result["actions"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run AI self-play games and log them to the playtest database")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--agents", nargs=2, choices=AGENTS, default=["greedy", "search"])
+    parser.add_argument("--db", default=playtest_db.DB_PATH)
+    parser.add_argument("--version", default="selfplay", help="version recorded on the sessions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mp", type=int, default=DEFAULT_BUDGET[0])
+    parser.add_argument("--mat", type=int, default=DEFAULT_BUDGET[1])
+    parser.add_argument("--turns", type=int, default=DEFAULT_TURNS)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    written = run(args.games, args.db, args.workers, tuple(args.agents), args.version, args.seed,
+                  (args.mp, args.mat), args.turns)
+    elapsed = time.perf_counter() - start
+    print(f"{args.games} games, {written} actions in {elapsed:.1f} s "
+          f"({args.games / elapsed * 3600:.0f} games/hour) -> {args.db}")
+
+
+if __name__ == "__main__":
+    main()